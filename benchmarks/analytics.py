@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+from pipelines.analytics import HOURS, MONGO_PIPELINES, STATION_SPAN, TripAnalytics, analyze_files
+from pipelines.extract.extraction import EcobiciDataExtractor
+from pipelines.load.load import EcobiciDataLoader
+from pipelines.transform.transformation import EcobiciDataTransformer
+from .harness import measure, summarize
+from .synthetic import HEADER_VARIANTS, generate_dataset
+
+load_dotenv()
+
+
+def group_counts(collection: Collection, table: str) -> Dict[int, int]:
+    """Runs one ``$group`` pipeline and returns its trip counts under the engine's keys."""
+    counts = {}
+    for document in collection.aggregate(MONGO_PIPELINES[table], allowDiskUse=True):
+        key = document["_id"]
+        if table == "od":
+            key = key["start_station_id"] * STATION_SPAN + key["end_station_id"]
+        elif table in ("departures", "arrivals"):
+            key = key["station_id"] * HOURS + int(key["hour"])
+        counts[key] = document["trips"]
+    return counts
+
+
+def check_equal(analytics: TripAnalytics, collection: Collection) -> None:
+    """Fails if any table differs from its MongoDB aggregation."""
+    for table in MONGO_PIPELINES:
+        sums = analytics.table(table)
+        if dict(zip(sums.keys.tolist(), sums.trips.tolist())) != group_counts(collection, table):
+            raise AssertionError(f"{table} differs from the $group result.")
+
+
+def benchmark_analytics(extractor: EcobiciDataExtractor, file_paths: List[Path], repeats: int, max_workers: int, executor: str, collection: Optional[Collection] = None) -> List[dict]:
+    """Times the in-process engine and, with a collection, the equivalent ``$group`` pipelines.
+
+    ``engine`` starts from transformed months already in memory, like the
+    aggregations start from loaded trips; ``engine_from_csv`` also reads and
+    transforms the months in the worker pool.
+    """
+    transformer = EcobiciDataTransformer()
+    frames = [transformer.transform_data(extractor.read_file_pandas(file_path), copy=False) for file_path in file_paths]
+    rows = sum(len(df) for df in frames)
+    results = []
+
+    durations, peak, analytics = measure(lambda: TripAnalytics.combine(TripAnalytics.from_frame(df) for df in frames), repeats)
+    results.append(summarize("engine", "all", rows, durations, peak))
+    durations, _, _ = measure(lambda: analyze_files(extractor, file_paths, max_workers, executor), repeats, trace_memory=False)
+    results.append(summarize(f"engine_from_csv_{executor}", "all", rows, durations, None))
+
+    if collection is not None:
+        collection.drop()
+        EcobiciDataLoader(collection).load(frames)
+        check_equal(analytics, collection)
+        total = []
+        for table in MONGO_PIPELINES:
+            durations, _, _ = measure(lambda: group_counts(collection, table), repeats, trace_memory=False)
+            results.append(summarize("mongo_group", table, rows, durations, None))
+            total.append(durations)
+        results.append(summarize("mongo_group", "all", rows, [sum(runs) for runs in zip(*total)], None))
+        collection.drop()
+    return results
+
+
+def main():
+    rows = int(os.getenv('BENCH_ROWS', 1_000_000))
+    repeats = int(os.getenv('BENCH_REPEATS', 3))
+    variants = [v for v in os.getenv('BENCH_VARIANTS', ','.join(HEADER_VARIANTS)).split(',') if v]
+    max_workers = int(os.getenv('MAX_WORKERS', 4))
+    executor = os.getenv('EXECUTOR', 'process')
+    base_path = Path(os.getenv('BENCH_DATA_DIR') or Path(tempfile.gettempdir()) / "ecobici_bench")
+    output = os.getenv('BENCH_OUTPUT')
+    mongodb_uri = os.getenv('MONGODB_URI')
+
+    file_paths = generate_dataset(base_path, rows, variants)
+    client = MongoClient(mongodb_uri) if mongodb_uri else None
+    try:
+        collection = client[os.getenv('MONGODB_DBNAME', 'benchmarks')]["bench_analytics"] if client is not None else None
+        results = benchmark_analytics(EcobiciDataExtractor(str(base_path)), file_paths, repeats, max_workers, executor, collection)
+    finally:
+        if client is not None:
+            client.close()
+
+    print(pd.DataFrame(results).to_string(index=False))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+import bson
+import pandas as pd
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+from pipelines.extract.extraction import EcobiciDataExtractor
+from pipelines.load.encoder import encode_frame
+from pipelines.load.load import EcobiciDataLoader
+from pipelines.transform.transformation import EcobiciDataTransformer
+from .harness import measure, summarize
+from .synthetic import generate_dataset
+
+load_dotenv()
+
+
+def encode_dicts(df: pd.DataFrame, batch_size: int) -> int:
+    """The ``to_dict`` path: one dict per trip, each encoded by PyMongo's BSON encoder."""
+    size = 0
+    for start in range(0, len(df), batch_size):
+        size += sum(len(bson.encode(document)) for document in EcobiciDataLoader.to_documents(df.iloc[start:start + batch_size]))
+    return size
+
+
+def encode_raw(df: pd.DataFrame, batch_size: int) -> int:
+    """The column-wise path: whole batches encoded into RawBSONDocument objects."""
+    size = 0
+    for start in range(0, len(df), batch_size):
+        size += sum(len(document.raw) for document in encode_frame(df.iloc[start:start + batch_size]))
+    return size
+
+
+def check_equal(df: pd.DataFrame, sample: int = 1_000) -> None:
+    """Fails if the raw documents do not decode to the same values as the ``to_dict`` documents."""
+    head = df.head(sample)
+    for raw, document in zip(encode_frame(head), EcobiciDataLoader.to_documents(head)):
+        decoded = bson.decode(raw.raw)
+        decoded.pop("_id")
+        if decoded != document:
+            raise AssertionError(f"Raw encoding differs: {decoded} != {document}")
+
+
+def benchmark_encoding(df: pd.DataFrame, batch_size: int, repeats: int, collection: Optional[Collection] = None) -> List[dict]:
+    """Times both encodings on one transformed month and, with a collection, a full load with each."""
+    check_equal(df)
+    results = []
+    for name, encode in (("to_dict", encode_dicts), ("raw_bson", encode_raw)):
+        durations, peak, size = measure(lambda: encode(df, batch_size), repeats)
+        result = summarize(f"encode_{name}", "synthetic", len(df), durations, peak)
+        result["bson_mb"] = round(size / 2**20, 1)
+        results.append(result)
+    if collection is not None:
+        for encoding in EcobiciDataLoader.ENCODINGS:
+            loader = EcobiciDataLoader(collection, batch_size=batch_size, encoding=encoding)
+
+            def load():
+                collection.drop()
+                return loader.load([df])
+
+            durations, _, stats = measure(load, repeats, trace_memory=False)
+            results.append(summarize(f"load_{encoding}", "synthetic", stats.documents, durations, None))
+        collection.drop()
+    return results
+
+
+def main():
+    rows = int(os.getenv('BENCH_ROWS', 1_000_000))
+    repeats = int(os.getenv('BENCH_REPEATS', 3))
+    batch_size = int(os.getenv('BATCH_SIZE', 10_000))
+    base_path = Path(os.getenv('BENCH_DATA_DIR') or Path(tempfile.gettempdir()) / "ecobici_bench")
+    output = os.getenv('BENCH_OUTPUT')
+    mongodb_uri = os.getenv('MONGODB_URI')
+
+    file_path = generate_dataset(base_path, rows, ["2024_lower"])[0]
+    df = EcobiciDataTransformer().transform_data(EcobiciDataExtractor(str(base_path)).read_file_pandas(file_path))
+    client = MongoClient(mongodb_uri) if mongodb_uri else None
+    try:
+        collection = client[os.getenv('MONGODB_DBNAME', 'benchmarks')]["bench_encoding"] if client is not None else None
+        results = benchmark_encoding(df, batch_size, repeats, collection)
+    finally:
+        if client is not None:
+            client.close()
+
+    print(pd.DataFrame(results).to_string(index=False))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
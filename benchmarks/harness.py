@@ -0,0 +1,196 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from pipelines.extract.extraction import EcobiciDataExtractor
+from pipelines.load.load import EcobiciDataLoader, peak_rss_mb
+from pipelines.transform.transformation import EcobiciDataTransformer
+from .synthetic import HEADER_VARIANTS, generate_dataset
+
+load_dotenv()
+
+
+def summarize(stage: str, variant: str, rows: int, durations: List[float], peak_alloc_mb: Optional[float]) -> dict:
+    """Latency percentiles and throughput of one stage over its repeated runs."""
+    p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+    return {
+        "stage": stage,
+        "variant": variant,
+        "rows": rows,
+        "runs": len(durations),
+        "mean_s": round(float(np.mean(durations)), 4),
+        "p50_s": round(float(p50), 4),
+        "p95_s": round(float(p95), 4),
+        "p99_s": round(float(p99), 4),
+        "rows_per_sec": round(rows / p50) if p50 else None,
+        "peak_alloc_mb": round(peak_alloc_mb, 1) if peak_alloc_mb is not None else None,
+    }
+
+
+def measure(func: Callable[[], object], repeats: int, trace_memory: bool = True) -> tuple:
+    """Times ``func`` over ``repeats`` runs, then runs it once more under tracemalloc.
+
+    The traced run is kept out of the timings because tracing slows
+    allocation-heavy code down considerably.
+
+    Returns:
+        tuple: The durations in seconds, the peak traced allocation in MB and the last result.
+    """
+    durations = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            result = func()
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return durations, peak, result
+
+
+def run_benchmark(base_path: Path, rows: int, variants: List[str], repeats: int = 3, collection=None, trace_memory: bool = True) -> dict:
+    """Generates the synthetic months and measures each pipeline stage on them.
+
+    Args:
+        base_path (Path): Where the synthetic ``ecobici_data`` folder lives.
+        rows (int): Rows per synthetic month.
+        variants (List[str]): Header variants to generate, one month each.
+        repeats (int): Timed runs per stage.
+        collection (Collection, optional): Scratch collection for the load stage;
+            the stage is skipped without one.
+        trace_memory (bool): Measure peak allocations with an extra traced run.
+
+    Returns:
+        dict: Run metadata and one result per stage and variant.
+    """
+    file_paths = generate_dataset(base_path, rows, variants)
+    extractor = EcobiciDataExtractor(str(base_path))
+    results = []
+
+    durations, peak, listed = measure(extractor.list_csv_files, repeats, trace_memory)
+    results.append(summarize("list_csv_files", "all", len(listed), durations, peak))
+
+    for variant, file_path in zip(variants, file_paths):
+        durations, peak, df = measure(lambda: extractor.read_file_pandas(file_path), repeats, trace_memory)
+        results.append(summarize("read_file_pandas", variant, len(df), durations, peak))
+
+        raw = pd.read_csv(file_path, low_memory=False)
+        durations, peak, _ = measure(lambda: extractor.standardize_columns(raw.copy(deep=False)), repeats, trace_memory)
+        results.append(summarize("standardize_columns", variant, len(raw), durations, peak))
+        del raw
+
+        # A fresh transformer per run, so its date-format and time caches start cold every time.
+        durations, peak, transformed = measure(lambda: EcobiciDataTransformer().transform_data(df), repeats, trace_memory)
+        results.append(summarize("transform_data", variant, len(df), durations, peak))
+
+        if collection is not None:
+            loader = EcobiciDataLoader(collection)
+
+            def load():
+                collection.drop()
+                return loader.load([transformed])
+
+            # Tracing every document conversion would dominate the load, so only wall time is measured.
+            durations, _, stats = measure(load, repeats, trace_memory=False)
+            results.append(summarize("load", variant, stats.documents, durations, None))
+            collection.drop()
+
+    return {"meta": run_metadata(rows, variants, repeats), "results": results, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_metadata(rows: int, variants: List[str], repeats: int) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "rows": rows,
+        "variants": variants,
+        "repeats": repeats,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> List[dict]:
+    """Stages whose median latency changed by more than ``threshold`` against a baseline run.
+
+    Returns:
+        List[dict]: One entry per stage and variant present in both runs, with
+        the relative change (positive is slower) and whether it is a regression.
+    """
+    previous: Dict[tuple, dict] = {(r["stage"], r["variant"]): r for r in baseline["results"]}
+    changes = []
+    for result in current["results"]:
+        before = previous.get((result["stage"], result["variant"]))
+        if not before or not before["p50_s"]:
+            continue
+        change = result["p50_s"] / before["p50_s"] - 1
+        if abs(change) > threshold:
+            changes.append({
+                "stage": result["stage"],
+                "variant": result["variant"],
+                "baseline_p50_s": before["p50_s"],
+                "p50_s": result["p50_s"],
+                "change_pct": round(100 * change, 1),
+                "regression": change > 0,
+            })
+    return changes
+
+
+def main():
+    rows = int(os.getenv('BENCH_ROWS', 1_000_000))
+    repeats = int(os.getenv('BENCH_REPEATS', 3))
+    variants = [v for v in os.getenv('BENCH_VARIANTS', ','.join(HEADER_VARIANTS)).split(',') if v]
+    base_path = Path(os.getenv('BENCH_DATA_DIR') or Path(tempfile.gettempdir()) / "ecobici_bench")
+    output = Path(os.getenv('BENCH_OUTPUT') or Path("benchmarks") / "results" / f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    baseline = os.getenv('BENCH_BASELINE')
+    trace_memory = os.getenv('BENCH_TRACE_MEMORY', '1') == '1'
+    mongodb_uri = os.getenv('MONGODB_URI')
+
+    client = MongoClient(mongodb_uri) if mongodb_uri else None
+    try:
+        collection = client[os.getenv('MONGODB_DBNAME', 'benchmarks')]["bench_trips"] if client is not None else None
+        report = run_benchmark(base_path, rows, variants, repeats, collection, trace_memory)
+    finally:
+        if client is not None:
+            client.close()
+
+    print(pd.DataFrame(report["results"]).to_string(index=False))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            changes = compare(json.load(f), report)
+        for change in changes:
+            label = "REGRESSION" if change["regression"] else "improvement"
+            print(f"{label}: {change['stage']} [{change['variant']}] {change['baseline_p50_s']}s -> {change['p50_s']}s ({change['change_pct']:+}%)")
+
+
+if __name__ == "__main__":
+    main()
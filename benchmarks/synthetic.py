@@ -0,0 +1,124 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.settings import COLUMN_MAPPING
+
+# Header layouts found in the historic ECOBICI files, in canonical column order
+# (gender, age, bike, start station, start date, start time, end station, end
+# date, end time), with the date format each era used.
+HEADER_VARIANTS: Dict[str, dict] = {
+    "2010_capitalized": {
+        "columns": ["Genero_Usuario", "Edad_Usuario", "Bici", "Ciclo_Estacion_Retiro", "Fecha_Retiro",
+                    "Hora_Retiro", "Ciclo_Estacion_Arribo", "Fecha_Arribo", "Hora_Arribo"],
+        "date_format": "%d/%m/%Y",
+    },
+    "2015_mixed_case": {
+        "columns": ["Genero_Usuario", "Edad_Usuario", "Bici", "Ciclo_Estacion_Retiro", "Fecha_retiro",
+                    "Hora_retiro", "Ciclo_EstacionArribo", "Fecha Arribo", "Hora_arribo"],
+        "date_format": "%d/%m/%Y",
+    },
+    "2019_short_upper": {
+        "columns": ["Genero_Usuario", "Edad_Usuario", "bikeid", "CE_retiro", "Fecha_Retiro",
+                    "Hora_Retiro", "CE_arribo", "Fecha_Arribo", "Hora_Arribo"],
+        "date_format": "%d/%m/%y",
+    },
+    "2021_short_lower": {
+        "columns": ["genero_usuario", "edad_usuario", "bici", "ce_retiro", "fecha_retiro",
+                    "hora_retiro", "ce_arribo", "fecha_arribo", "hora_arribo"],
+        "date_format": "%d/%m/%Y",
+    },
+    "2023_duplicated_time": {
+        "columns": ["genero_usuario", "edad_usuario", "bici", "ciclo_estacion_retiro", "fecha_retiro",
+                    "hora_retiro.1", "ciclo_estacion_arribo", "fecha_arribo", "hora_arribo"],
+        "date_format": "%Y-%m-%d",
+    },
+    "2024_lower": {
+        "columns": ["genero_usuario", "edad_usuario", "bici", "ciclo_estacion_retiro", "fecha_retiro",
+                    "hora_retiro", "ciclo_estacionarribo", "fecha_arribo", "hora_arribo"],
+        "date_format": "%Y-%m-%d",
+    },
+}
+
+CANONICAL_COLUMNS = ["genero_usuario", "edad_usuario", "bici", "ciclo_estacion_retiro", "fecha_retiro",
+                     "hora_retiro", "ciclo_estacion_arribo", "fecha_arribo", "hora_arribo"]
+
+
+def check_variants() -> None:
+    """Fails if a header variant does not map onto every canonical column through COLUMN_MAPPING."""
+    for name, variant in HEADER_VARIANTS.items():
+        mapped = [COLUMN_MAPPING.get(col) for col in variant["columns"]]
+        if mapped != CANONICAL_COLUMNS:
+            raise ValueError(f"Header variant {name} maps to {mapped}.")
+
+
+# "HH:MM:SS" label of every second of the day, indexed by seconds since midnight.
+TIME_LABELS = np.array([f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(86_400)])
+
+
+def synthetic_trips(rows: int, month: str, date_format: str, seed: Optional[int] = None, stations: int = 680, bikes: int = 15_000) -> pd.DataFrame:
+    """Generates trips with realistic types and cardinalities for one ``YYYY-MM`` month.
+
+    Durations follow an exponential distribution (mean 15 minutes); about 1%
+    of the ages are missing, as in the published files. Dates and times are
+    looked up from per-day and per-second labels instead of formatting every row.
+    """
+    rng = np.random.default_rng(seed)
+    first_day = pd.Timestamp(f"{month}-01")
+    days = (first_day + pd.offsets.MonthBegin(1) - first_day).days
+    start = rng.integers(0, days * 86_400, rows)
+    end = start + rng.exponential(900, rows).astype(np.int64) + 60
+    date_labels = np.array(pd.date_range(first_day, periods=end.max() // 86_400 + 1).strftime(date_format))
+    age = rng.integers(16, 80, rows).astype(float)
+    age[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        "genero_usuario": rng.choice(np.array(["M", "F", "O"]), rows, p=[0.7, 0.28, 0.02]),
+        "edad_usuario": age,
+        "bici": rng.integers(1, bikes, rows),
+        "ciclo_estacion_retiro": rng.integers(1, stations, rows),
+        "fecha_retiro": date_labels[start // 86_400],
+        "hora_retiro": TIME_LABELS[start % 86_400],
+        "ciclo_estacion_arribo": rng.integers(1, stations, rows),
+        "fecha_arribo": date_labels[end // 86_400],
+        "hora_arribo": TIME_LABELS[end % 86_400],
+    })
+
+
+def write_month(path: Path, rows: int, month: str, variant: str, seed: int = 0, chunk_rows: int = 1_000_000) -> Path:
+    """Writes a synthetic monthly CSV with the header of ``variant``, ``chunk_rows`` rows at a time."""
+    spec = HEADER_VARIANTS[variant]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".csv.tmp")
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        for i, start in enumerate(range(0, rows, chunk_rows)):
+            df = synthetic_trips(min(chunk_rows, rows - start), month, spec["date_format"], seed=seed + i)
+            df.columns = spec["columns"]
+            df.to_csv(f, index=False, header=i == 0)
+    tmp_path.replace(path)
+    return path
+
+
+def generate_dataset(base_path: Path, rows: int, variants: Optional[List[str]] = None, subfolder: str = "ecobici_data", seed: int = 0) -> List[Path]:
+    """Writes one month per header variant under ``<base_path>/<subfolder>/<year>/<YYYY-MM>.csv``.
+
+    Files that already exist with the requested number of rows are reused,
+    so repeated benchmark runs only pay for generation once.
+
+    Returns:
+        List[Path]: The generated (or reused) files, in variant order.
+    """
+    check_variants()
+    paths = []
+    for variant in variants or HEADER_VARIANTS:
+        # Each variant gets its own month so the files sort and partition like real ones.
+        i = list(HEADER_VARIANTS).index(variant)
+        month = f"{2010 + i * 3}-{(i % 12) + 1:02d}"
+        path = Path(base_path) / subfolder / month[:4] / f"{month}.csv"
+        marker = path.with_suffix(".rows")
+        if not (path.exists() and marker.exists() and marker.read_text() == str(rows)):
+            write_month(path, rows, month, variant, seed=seed + i * 1000)
+            marker.write_text(str(rows))
+        paths.append(path)
+    return paths
@@ -0,0 +1,122 @@
+import json
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.database import Database
+
+from config.settings import LAYOUT_INDEXES, TRIP_LAYOUTS
+from pipelines.extract.extraction import EcobiciDataExtractor
+from pipelines.load.load import EcobiciDataLoader
+from pipelines.transform.transformation import EcobiciDataTransformer
+
+load_dotenv()
+
+
+def range_query(db: Database, layout: str, name: str) -> Callable[[int, object, object], int]:
+    """Returns a function that fetches the trips leaving a station in ``[start, end)`` and counts them."""
+    collection = db[name]
+    if layout == "flat":
+        return lambda station, start, end: len(list(collection.find(
+            {"start_station_id": station, "start_timestamp": {"$gte": start, "$lt": end}})))
+    if layout == "timeseries":
+        return lambda station, start, end: len(list(collection.find(
+            {"meta.start_station_id": station, "start_timestamp": {"$gte": start, "$lt": end}})))
+
+    def bucket_query(station, start, end):
+        buckets = collection.find({
+            "start_station_id": station,
+            "start_date": {"$gte": start.strftime("%Y-%m-%d"), "$lte": end.strftime("%Y-%m-%d")},
+        })
+        return sum(
+            1 for bucket in buckets for trip in bucket["trips"]
+            if trip.get("start_timestamp") is not None and start <= trip["start_timestamp"] < end
+        )
+    return bucket_query
+
+
+def storage_stats(db: Database, name: str) -> Dict[str, int]:
+    stats = db.command("collStats", name)
+    return {
+        "storage_mb": round(stats.get("storageSize", 0) / 2**20, 2),
+        "index_mb": round(stats.get("totalIndexSize", 0) / 2**20, 2),
+        # Time-series collections report their buckets; the other layouts their documents.
+        "documents": stats.get("timeseries", {}).get("bucketCount", stats.get("count", 0)),
+    }
+
+
+def benchmark_layouts(db: Database, extractor: EcobiciDataExtractor, file_paths, queries: int = 50, window_hours: int = 24, seed: int = 0) -> List[dict]:
+    """Loads the same months with every layout and compares storage and range-query latency.
+
+    Args:
+        db (Database): Scratch database; ``bench_trips_<layout>`` collections are dropped and recreated.
+        extractor (EcobiciDataExtractor): Source of the monthly files.
+        file_paths (List[Path]): Months to load.
+        queries (int): Station/time-window queries per layout.
+        window_hours (int): Width of each time window.
+        seed (int): Seed for the query sample, so every layout answers the same queries.
+    """
+    transformer = EcobiciDataTransformer()
+    results = []
+    samples = None
+    for layout in TRIP_LAYOUTS:
+        name = f"bench_trips_{layout}"
+        db.drop_collection(name)
+        loader = EcobiciDataLoader(db[name], index_specs=LAYOUT_INDEXES[layout], layout=layout)
+        loader.ensure_collection()
+        stats = loader.load(transformer.transform_chunks(extractor.iter_chunks(file_paths)))
+        loader.create_indexes()
+
+        if samples is None:
+            flat = db[name].aggregate([{"$sample": {"size": queries}}]) if layout == "flat" else []
+            rng = random.Random(seed)
+            samples = [
+                (trip["start_station_id"], trip["start_timestamp"] - timedelta(hours=rng.uniform(0, window_hours)))
+                for trip in flat if trip.get("start_timestamp") is not None
+            ]
+        query = range_query(db, layout, name)
+        latencies, returned = [], 0
+        for station, start in samples:
+            begin = time.perf_counter()
+            returned += query(station, start, start + timedelta(hours=window_hours))
+            latencies.append((time.perf_counter() - begin) * 1000)
+
+        results.append({
+            "layout": layout,
+            "load_sec": round(stats.elapsed, 2),
+            "docs_per_sec": round(stats.docs_per_sec),
+            **storage_stats(db, name),
+            "queries": len(latencies),
+            "trips_returned": returned,
+            "p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+            "p95_ms": round(statistics.quantiles(latencies, n=20)[-1], 2) if len(latencies) > 1 else None,
+        })
+    return results
+
+
+def main():
+    source = os.getenv('BASE_PATH')
+    months = int(os.getenv('BENCH_MONTHS', 1))
+    queries = int(os.getenv('BENCH_QUERIES', 50))
+    output = os.getenv('BENCH_OUTPUT')
+    client = MongoClient(os.getenv('MONGODB_URI'))
+    try:
+        extractor = EcobiciDataExtractor(source)
+        file_paths = extractor.list_csv_files()[:months]
+        results = benchmark_layouts(client[os.getenv('MONGODB_DBNAME', 'benchmarks')], extractor, file_paths, queries)
+    finally:
+        client.close()
+    for row in results:
+        print(row)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import re
+from typing import Dict, Iterable
+
+# Naming of the monthly trip partitions, shared by the pipeline loader and the
+# MongoDB manager. Plain Python, so the manager does not import the pipeline.
+MONTH_PATTERN = re.compile(r"^(\d{4})-(\d{2})$")
+
+
+def partition_name(base_name: str, month: str) -> str:
+    """Name of the collection that holds one ``YYYY-MM`` month, e.g. ``trips_2024_03``."""
+    if not MONTH_PATTERN.match(month):
+        raise ValueError(f"Invalid month: {month}. Expected YYYY-MM.")
+    return f"{base_name}_{month.replace('-', '_')}"
+
+
+def partition_months(names: Iterable[str], base_name: str) -> Dict[str, str]:
+    """Months that have a partition among ``names``, mapped to their collection names, in month order."""
+    pattern = re.compile(rf"^{re.escape(base_name)}_(\d{{4}})_(\d{{2}})$")
+    months = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            months[f"{match.group(1)}-{match.group(2)}"] = name
+    return dict(sorted(months.items()))
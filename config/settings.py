@@ -36,4 +36,96 @@ COLUMN_MAPPING = {
     "hora_arribo": "hora_arribo",
     "Hora_Arribo": "hora_arribo",
     "Hora_arribo": "hora_arribo",
-}
\ No newline at end of file
+}
+
+# dtypes applied by the extractor at read_csv time, keyed by canonical column.
+# Numbers are read as float64 rather than small ints: the C parser silently
+# wraps out-of-range values into nullable small ints (300 -> 44 for UInt8),
+# so range checks and the final narrowing happen in TRIP_SCHEMA. float32 would
+# round ids above 2**24 to a neighbouring valid id; float64 is exact for every
+# UInt32 bike id. Times are left
+# as strings: with tens of thousands of distinct values per chunk, parsing them
+# as categoricals costs more than it saves.
+CSV_DTYPES = {
+    "genero_usuario": "category",
+    "edad_usuario": "float64",
+    "bici": "float64",
+    "ciclo_estacion_retiro": "float64",
+    "ciclo_estacion_arribo": "float64",
+    "fecha_retiro": "category",
+    "fecha_arribo": "category",
+}
+
+# dtypes of the transformed trip records. Values outside an integer type's
+# range become <NA>; start_time/end_time are minutes since midnight.
+TRIP_SCHEMA = {
+    "gender": "category",
+    "age": "UInt8",
+    "bike_id": "UInt32",
+    "start_station_id": "UInt16",
+    "end_station_id": "UInt16",
+    "start_date": "category",
+    "end_date": "category",
+    "start_time": "UInt16",
+    "end_time": "UInt16",
+    "start_timestamp": "datetime64[ns]",
+    "end_timestamp": "datetime64[ns]",
+    "source_month": "category",
+}
+
+# Bounds of the data-quality rules (pipelines/transform/validation.py). Ages
+# are in years; trips longer than the maximum duration are clock or dock errors.
+AGE_RANGE = (16, 99)
+MAX_TRIP_HOURS = 24
+
+# Secondary indexes of the trips collection, as IndexModel keys plus options.
+# They cover the common access paths: trips leaving or arriving at a station
+# in a time range, a bike's history and month-level reloads.
+TRIP_INDEXES = [
+    {"keys": [("start_station_id", 1), ("start_timestamp", 1)]},
+    {"keys": [("end_station_id", 1), ("end_timestamp", 1)]},
+    {"keys": [("bike_id", 1), ("start_timestamp", 1)]},
+    {"keys": [("source_month", 1)]},
+]
+
+# Columns that identify a trip across files. Monthly files overlap at their
+# boundaries, so the same trip can appear twice; its 64-bit hash is stored in
+# ``trip_key`` and enforced unique in MongoDB (flat layout only, as time-series
+# collections do not support unique indexes). Trips without a key are null and
+# left out of the index by the partial filter.
+TRIP_KEY_COLUMNS = ("bike_id", "start_station_id", "start_timestamp", "end_station_id")
+TRIP_KEY_INDEX = {
+    "keys": [("trip_key", 1)],
+    "unique": True,
+    "partialFilterExpression": {"trip_key": {"$type": "long"}},
+}
+
+# Storage layouts of the trips collection:
+#   flat        one document per trip (default).
+#   timeseries  a MongoDB 5.0+ time-series collection; the server groups trips
+#               of the same start station into compressed buckets by start time.
+#   bucket      application-level buckets, one document per station and hour
+#               with the trips embedded, for servers without time-series support.
+TRIP_LAYOUTS = ("flat", "timeseries", "bucket")
+
+# Options of the time-series trips collection. Only the start station goes in
+# the metaField: bikes have too many distinct values to make useful buckets.
+TRIP_TIMESERIES = {
+    "timeField": "start_timestamp",
+    "metaField": "meta",
+    "granularity": "minutes",
+}
+
+# Secondary indexes of each layout, as in TRIP_INDEXES.
+LAYOUT_INDEXES = {
+    "flat": TRIP_INDEXES,
+    "timeseries": [
+        {"keys": [("meta.start_station_id", 1), ("start_timestamp", 1)]},
+        {"keys": [("bike_id", 1), ("start_timestamp", 1)]},
+        {"keys": [("source_month", 1)]},
+    ],
+    "bucket": [
+        {"keys": [("start_station_id", 1), ("start_date", 1), ("hour", 1)]},
+        {"keys": [("source_month", 1)]},
+    ],
+}
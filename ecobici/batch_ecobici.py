@@ -1,16 +1,22 @@
+import json
 import logging
 import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Any, BinaryIO, ContextManager, Dict, Iterator, List, Optional
 from urllib.parse import urljoin
 
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup # type: ignore
 
-from settings import BASE_URL, ROOT_FOLDER, MONTHS_MAPPING
+try:
+    from settings import BASE_URL, ROOT_FOLDER, MONTHS_MAPPING
+except ImportError:  # imported as a package, e.g. from pipelines
+    from ecobici.settings import BASE_URL, ROOT_FOLDER, MONTHS_MAPPING
 
 def setup_logging() -> None:
     """Configures logging for the downloader."""
@@ -40,6 +46,21 @@ class CsvFileInfo:
     month: str
     downloaded: bool = field(default=False)
 
+class TeeReader:
+    """Binary file-like wrapper that copies everything read from ``source`` into ``sink``."""
+
+    def __init__(self, source: BinaryIO, sink: BinaryIO) -> None:
+        self.source = source
+        self.sink = sink
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        self.sink.write(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
+
 class Config:
     """Handles application configuration."""
     def __init__(self) -> None:
@@ -48,6 +69,9 @@ class Config:
         self.timeout: int = 10
         self.max_retries: int = 3
         self.retry_delay: int = 2
+        self.max_workers: int = 4
+        self.chunk_size: int = 1024 * 1024
+        self.revalidate: bool = False
 
 class EcobiciDataDownloader:
     """Main class for downloading Ecobici data."""
@@ -61,10 +85,21 @@ class EcobiciDataDownloader:
         re.compile(r'(\d{4})[_-]([a-záéíóú]+)', re.IGNORECASE),  # YYYY_Mon en cualquier parte
     ]
 
-    def __init__(self, config: Config) -> None:
+    def __init__(self, config: Config, metrics: Optional[Any] = None) -> None:
+        """Initializes the downloader.
+
+        Args:
+            config (Config): Download settings.
+            metrics (Metrics, optional): Instrumentation sink with ``span`` and
+                ``inc`` (e.g. ``pipelines.metrics.Metrics``); nothing is recorded without one.
+        """
         self.config = config
+        self.metrics = metrics
         self.session = requests.Session()
         self.session.headers.update({'User-Agent': 'EcobiciDataDownloader/1.0'})
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(config.max_workers, 10))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def __enter__(self):
         return self
@@ -72,6 +107,13 @@ class EcobiciDataDownloader:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.session.close()
 
+    def _span(self, name: str, **labels) -> ContextManager[dict]:
+        return self.metrics.span(name, **labels) if self.metrics is not None else nullcontext({})
+
+    def _inc(self, name: str, value: float = 1, **labels) -> None:
+        if self.metrics is not None:
+            self.metrics.inc(name, value, **labels)
+
     def get_csv_urls(self) -> List[str]:
         """Gets all CSV file URLs from the base page.
 
@@ -116,48 +158,202 @@ class EcobiciDataDownloader:
         logging.warning(f"Could not extract date from: {filename}")
         return None
 
+    def list_files(self) -> List[CsvFileInfo]:
+        """Gets the CSV URLs and describes each one with its normalized date.
+
+        Returns:
+            List[CsvFileInfo]: One entry per CSV URL; undated files get year '0000'.
+        """
+        files: List[CsvFileInfo] = []
+        for url in self.get_csv_urls():
+            normalized_date = self.extract_date_from_url(url) or '0000-00'
+            files.append(CsvFileInfo(url, normalized_date, normalized_date[:4], normalized_date[5:7]))
+        return files
+
     def create_folder(self, folder_name: str) -> None:
         """Creates a folder if it does not exist."""
         os.makedirs(folder_name, exist_ok=True)
         logging.debug(f"Ensured folder exists: {folder_name}")
 
+    @staticmethod
+    def _read_validators(meta_path: str) -> Dict[str, str]:
+        if not os.path.exists(meta_path):
+            return {}
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_validators(meta_path: str, response: requests.Response) -> None:
+        validators = {
+            key: response.headers[header]
+            for key, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified'))
+            if header in response.headers
+        }
+        if validators:
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(validators, f)
+
+    @staticmethod
+    def _is_retryable(error: requests.RequestException) -> bool:
+        response = getattr(error, 'response', None)
+        if response is None:
+            return True
+        return response.status_code == 429 or response.status_code >= 500
+
+    def _fetch(self, file_info: CsvFileInfo, file_path: str) -> None:
+        """Performs one download attempt, resuming a partial file when possible.
+
+        The body is streamed into ``<file>.part`` and renamed over the final
+        path once complete. Validators (ETag/Last-Modified) are kept in
+        ``<file>.meta.json`` and used for ``If-Range`` when resuming and for
+        conditional requests when revalidating an existing file.
+        """
+        part_path = f"{file_path}.part"
+        meta_path = f"{file_path}.meta.json"
+        validators = self._read_validators(meta_path)
+        validator = validators.get('etag') or validators.get('last_modified')
+        headers: Dict[str, str] = {}
+
+        if os.path.exists(file_path):
+            if 'etag' in validators:
+                headers['If-None-Match'] = validators['etag']
+            if 'last_modified' in validators:
+                headers['If-Modified-Since'] = validators['last_modified']
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset and validator:
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = validator
+
+        with self.session.get(file_info.url, headers=headers, stream=True, timeout=self.config.timeout) as response:
+            if response.status_code == 304:
+                logging.debug(f"Not modified: {file_path}")
+                self._inc('download_not_modified_total')
+                return
+            if response.status_code == 416:
+                # The partial file does not match the remote resource anymore: start over.
+                os.remove(part_path)
+                return self._fetch(file_info, file_path)
+            response.raise_for_status()
+            resumed = response.status_code == 206
+            if not resumed:
+                self._write_validators(meta_path, response)
+            with open(part_path, 'ab' if resumed else 'wb') as f:
+                for block in response.iter_content(chunk_size=self.config.chunk_size):
+                    f.write(block)
+                    self._inc('download_bytes_total', len(block))
+        os.replace(part_path, file_path)
+        logging.info(f"Downloaded: {file_path}" + (f" (resumed at byte {offset})" if resumed else ""))
+
+    def target_path(self, file_info: CsvFileInfo) -> str:
+        """Local path of a file: ``<root>/<year>/<YYYY-MM>.csv``."""
+        return os.path.join(self.config.root_folder, file_info.year, f"{file_info.normalized_date}.csv")
+
     def download_csv(self, file_info: CsvFileInfo) -> None:
         """Downloads a CSV file and saves it locally.
 
+        The response is streamed to disk in ``config.chunk_size`` blocks.
+        Connection errors, 429 and 5xx responses are retried up to
+        ``config.max_retries`` times with exponential backoff starting at
+        ``config.retry_delay`` seconds, resuming from the bytes already
+        written. Existing files are skipped unless ``config.revalidate`` is
+        set, in which case a conditional request is made.
+
         Args:
             file_info (CsvFileInfo): Information about the file to download.
-
-        Raises:
-            requests.RequestException: If the download fails.
-            OSError: If there are problems writing the file.
         """
         if file_info.year == '0000':
             logging.warning(f"Skipping invalid year: {file_info.year} for URL: {file_info.url}")
             return
 
-        folder_path = os.path.join(self.config.root_folder, file_info.year)
-        filename = f"{file_info.normalized_date}.csv"
-        file_path = os.path.join(folder_path, filename)
+        file_path = self.target_path(file_info)
+        folder_path = os.path.dirname(file_path)
 
-        try:
-            if os.path.exists(file_path):
-                logging.debug(f"File already exists: {file_path}")
-                file_info.downloaded = True
-                return
+        if os.path.exists(file_path) and not self.config.revalidate:
+            logging.debug(f"File already exists: {file_path}")
+            file_info.downloaded = True
+            return
+
+        os.makedirs(folder_path, exist_ok=True)
+        with self._span('download_file', month=file_info.normalized_date):
+            for attempt in range(1, self.config.max_retries + 1):
+                try:
+                    self._fetch(file_info, file_path)
+                    file_info.downloaded = True
+                    return
+                except requests.RequestException as e:
+                    if attempt == self.config.max_retries or not self._is_retryable(e):
+                        logging.error(f"Download failed for {file_info.url}: {str(e)}")
+                        self._inc('download_errors_total')
+                        return
+                    delay = self.config.retry_delay * 2 ** (attempt - 1)
+                    logging.warning(f"Attempt {attempt} failed for {file_info.url}: {str(e)}. Retrying in {delay}s")
+                    self._inc('download_retries_total')
+                    time.sleep(delay)
+                except OSError as e:
+                    logging.error(f"File write error for {file_path}: {str(e)}")
+                    self._inc('download_errors_total')
+                    return
+
+    @contextmanager
+    def open_stream(self, file_info: CsvFileInfo, tee_path: Optional[str] = None) -> Iterator[BinaryIO]:
+        """Opens the body of a CSV URL as a binary stream, without saving it first.
 
-            os.makedirs(folder_path, exist_ok=True)
-            response = self.session.get(file_info.url, timeout=self.config.timeout)
+        Args:
+            file_info (CsvFileInfo): File to stream.
+            tee_path (str, optional): Also write the bytes read to this path. The
+                copy is written to ``<tee_path>.part`` and only renamed into place
+                if the stream is consumed without errors.
+
+        Yields:
+            BinaryIO: Decompressed response body.
+
+        Raises:
+            requests.RequestException: If the request fails.
+        """
+        with self._span('download_stream', month=file_info.normalized_date), \
+                self.session.get(file_info.url, stream=True, timeout=self.config.timeout) as response:
             response.raise_for_status()
+            response.raw.decode_content = True
+            if tee_path is None:
+                yield response.raw
+                return
+            os.makedirs(os.path.dirname(tee_path) or '.', exist_ok=True)
+            part_path = f"{tee_path}.part"
+            try:
+                with open(part_path, 'wb') as sink:
+                    yield TeeReader(response.raw, sink)
+                    # Copy whatever the consumer did not read so the tee is complete.
+                    for block in iter(lambda: response.raw.read(self.config.chunk_size), b''):
+                        sink.write(block)
+                os.replace(part_path, tee_path)
+            finally:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
 
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-                file_info.downloaded = True
-                logging.info(f"Downloaded: {file_path}")
+    def download_all(self, files: List[CsvFileInfo], max_workers: Optional[int] = None) -> None:
+        """Downloads files concurrently with at most ``max_workers`` connections.
 
-        except requests.RequestException as e:
-            logging.error(f"Download failed for {file_info.url}: {str(e)}")
-        except OSError as e:
-            logging.error(f"File write error for {file_path}: {str(e)}")
+        Args:
+            files (List[CsvFileInfo]): Files to download.
+            max_workers (int, optional): Defaults to ``config.max_workers``.
+
+        Only the first URL for each local path is downloaded: two URLs that
+        normalize to the same month would otherwise write into the same
+        ``.part`` file at once.
+        """
+        targets: Dict[str, CsvFileInfo] = {}
+        for file_info in files:
+            file_path = self.target_path(file_info)
+            if file_path in targets:
+                logging.warning(f"Skipping {file_info.url}: {file_path} is already downloaded from {targets[file_path].url}")
+                self._inc('download_duplicates_total')
+                continue
+            targets[file_path] = file_info
+        with ThreadPoolExecutor(max_workers=max_workers or self.config.max_workers) as executor:
+            list(executor.map(self.download_csv, targets.values()))
 
 def generate_report(files: List[CsvFileInfo], root_folder: str) -> None:
     """Generates a CSV report of the download process."""
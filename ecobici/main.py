@@ -17,23 +17,15 @@ def main() -> None:
             if not os.path.exists(config.root_folder):
                 os.makedirs(config.root_folder)
 
-            urls = downloader.get_csv_urls()
-            if not urls:
+            files: List[CsvFileInfo] = downloader.list_files()
+            if not files:
                 logging.warning("No CSV files found.")
                 return
 
-            files: List[CsvFileInfo] = []
-            for url in urls:
-                normalized_date = downloader.extract_date_from_url(url)
-                year = normalized_date[:4]
-                month = normalized_date[5:7]
-                files.append(CsvFileInfo(url, normalized_date, year, month))
-
             for year in set(f.year for f in files):
                 downloader.create_folder(os.path.join(config.root_folder, year))
 
-            for file_info in files:
-                downloader.download_csv(file_info)
+            downloader.download_all(files)
 
             generate_report(files, config.root_folder)
 
@@ -1,7 +1,18 @@
 import logging
 import os
 import zipfile
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Optional, Tuple
+
+# Métodos de compresión disponibles. zstd solo existe en zipfile a partir de Python 3.14.
+COMPRESSIONS: Dict[str, int] = {
+    "stored": zipfile.ZIP_STORED,
+    "deflated": zipfile.ZIP_DEFLATED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+if hasattr(zipfile, "ZIP_ZSTANDARD"):
+    COMPRESSIONS["zstd"] = zipfile.ZIP_ZSTANDARD
 
 def setup_logging() -> None:
     """Configura el sistema de logging para el proceso de zipeado."""
@@ -13,33 +24,85 @@ def setup_logging() -> None:
         ]
     )
 
-def zip_ecobici_by_year(base_dir: str = 'ecobici_historic_csv', output_dir: str = 'ecobici_zips') -> None:
-    """Crea archivos ZIP por año a partir de carpetas de datos Ecobici.
+def zip_year(base_dir: str, year: str, zip_path: str, compression: str = "deflated", compresslevel: Optional[int] = None) -> Tuple[str, int]:
+    """Crea el ZIP de un año. Se ejecuta en un proceso aparte por año.
+
+    El archivo se escribe primero con extensión ``.tmp`` y se renombra al
+    terminar, para que un ZIP a medias nunca se confunda con uno completo;
+    si algo falla, el ``.tmp`` se borra.
+
+    Args:
+        base_dir (str): Directorio base donde están los datos por año.
+        year (str): Carpeta del año a comprimir.
+        zip_path (str): Ruta del ZIP de salida.
+        compression (str): Una de las claves de ``COMPRESSIONS``.
+        compresslevel (int, optional): Nivel de compresión (0-9 para deflated y bzip2, 1-22 para zstd).
+
+    Returns:
+        Tuple[str, int]: La ruta del ZIP y su tamaño en bytes.
+    """
+    year_path = os.path.join(base_dir, year)
+    tmp_path = zip_path + ".tmp"
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', COMPRESSIONS[compression], compresslevel=compresslevel) as zipf:
+            for root, _, files in os.walk(year_path):
+                for file in sorted(files):
+                    full_path = os.path.join(root, file)
+                    arcname = os.path.relpath(full_path, base_dir)
+                    zipf.write(full_path, arcname)
+        os.replace(tmp_path, zip_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return zip_path, os.path.getsize(zip_path)
+
+def zip_ecobici_by_year(base_dir: str = 'ecobici_historic_csv', output_dir: Optional[str] = None, compression: str = "deflated", compresslevel: Optional[int] = None, max_workers: Optional[int] = None) -> None:
+    """Crea archivos ZIP por año a partir de carpetas de datos Ecobici, un año por proceso.
+
+    Los ZIP guardan los CSV como ``<año>/<YYYY-MM>.csv`` y por defecto se
+    escriben junto a las carpetas de los años. El extractor lee los meses
+    directamente desde los ZIP de su carpeta de datos
+    (``<BASE_PATH>/ecobici_data``), así que para eso ``base_dir`` (o
+    ``output_dir``) debe ser esa carpeta.
 
     Args:
         base_dir (str): Directorio base donde están los datos por año.
-        output_dir (str): Directorio donde se guardarán los ZIPs.
+        output_dir (str, optional): Directorio donde se guardarán los ZIPs; None usa ``base_dir``.
+        compression (str): Una de las claves de ``COMPRESSIONS``.
+        compresslevel (int, optional): Nivel de compresión; None usa el del método.
+        max_workers (int, optional): Procesos en paralelo; None usa todos los núcleos.
     """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compresión no soportada: {compression}. Usa una de {list(COMPRESSIONS)}.")
+    output_dir = output_dir or base_dir
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    for year in os.listdir(base_dir):
-        year_path = os.path.join(base_dir, year)
-        if os.path.isdir(year_path):
-            zip_path = os.path.join(output_dir, f"{year}.zip")
+    years = [year for year in sorted(os.listdir(base_dir)) if os.path.isdir(os.path.join(base_dir, year))]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(zip_year, base_dir, year, os.path.join(output_dir, f"{year}.zip"), compression, compresslevel): year
+            for year in years
+        }
+        for future in as_completed(futures):
+            year = futures[future]
             try:
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for root, _, files in os.walk(year_path):
-                        for file in files:
-                            full_path = os.path.join(root, file)
-                            arcname = os.path.relpath(full_path, base_dir)
-                            zipf.write(full_path, arcname)
-                logging.info(f"Created zip for year {year}: {zip_path}")
+                zip_path, size = future.result()
+                logging.info(f"Created zip for year {year}: {zip_path} ({size / 2**20:.1f} MB)")
             except Exception as e:
                 logging.error(f"Error creating zip for year {year}: {e}")
 
 if __name__ == "__main__":
     setup_logging()
     logging.info("Starting zipping process...")
-    zip_ecobici_by_year()
-    logging.info("Zipping process completed.")
\ No newline at end of file
+    level = os.getenv("ZIP_LEVEL")
+    workers = os.getenv("ZIP_WORKERS")
+    zip_ecobici_by_year(
+        base_dir=os.getenv("ZIP_SOURCE", 'ecobici_historic_csv'),
+        output_dir=os.getenv("ZIP_OUTPUT"),
+        compression=os.getenv("ZIP_COMPRESSION", "deflated"),
+        compresslevel=int(level) if level else None,
+        max_workers=int(workers) if workers else None,
+    )
+    logging.info("Zipping process completed.")
@@ -0,0 +1,258 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Iterable, List, Optional, Sequence, Set, Tuple
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import BulkWriteError, PyMongoError
+from pymongo.write_concern import WriteConcern
+from settings import (
+    MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE, MONGODB_COMPRESSORS,
+    WRITE_CONCERNS, COLLECTION_CACHE_TTL,
+)
+
+class AsyncMongoCollectionManager:
+    """Asyncio counterpart of MongoCollectionManager built on PyMongo's async API.
+
+    The client is tied to the event loop it first runs on, so create the
+    manager inside the loop and ``close`` it (or use ``async with``) before
+    the loop ends.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        db_name: str,
+        write_concern: str = "default",
+        concurrency: int = 8,
+        cache_ttl: float = COLLECTION_CACHE_TTL,
+        **client_options: Any,
+    ) -> None:
+        """Initializes the AsyncMongoCollectionManager.
+
+        Args:
+            uri (str): MongoDB connection URI.
+            db_name (str): Name of the database to use.
+            write_concern (str): Preset from ``WRITE_CONCERNS`` ("default", "bulk" or "interactive").
+            concurrency (int): Default number of operations the ``*_concurrently`` helpers run at once.
+            cache_ttl (float): Seconds the collection names are cached.
+            **client_options: Extra AsyncMongoClient options.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be positive.")
+        options = {
+            "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+            "minPoolSize": MONGODB_MIN_POOL_SIZE,
+            **({"compressors": MONGODB_COMPRESSORS} if MONGODB_COMPRESSORS else {}),
+            **client_options,
+        }
+        self.client = AsyncMongoClient(uri, **options)
+        self.db = self.client.get_database(db_name, write_concern=WriteConcern(**WRITE_CONCERNS[write_concern]))
+        self.concurrency = concurrency
+        self.cache_ttl = cache_ttl
+        self._collection_names: Optional[Set[str]] = None
+        self._cached_at = 0.0
+
+    async def __aenter__(self) -> "AsyncMongoCollectionManager":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def invalidate_cache(self) -> None:
+        """Forgets the cached collection names; the next lookup asks the server."""
+        self._collection_names = None
+
+    async def _names(self, refresh: bool = False) -> Set[str]:
+        expired = time.monotonic() - self._cached_at > self.cache_ttl
+        if refresh or expired or self._collection_names is None:
+            self._collection_names = set(await self.db.list_collection_names())
+            self._cached_at = time.monotonic()
+        return self._collection_names
+
+    async def _exists(self, name: str) -> bool:
+        return name in await self._names() or name in await self._names(refresh=True)
+
+    async def list_collections(self) -> List[str]:
+        """Lists all collection names in the database."""
+        return sorted(await self._names(refresh=True))
+
+    async def create_collection(self, name: str) -> Optional[AsyncCollection]:
+        """Creates a new collection if it does not exist.
+
+        Returns:
+            AsyncCollection or None: The created collection or None if it already exists.
+        """
+        if await self._exists(name):
+            return None
+        try:
+            created = await self.db.create_collection(name)
+            (await self._names()).add(name)
+            return created
+        except PyMongoError as e:
+            print(f"Error creating collection: {e}")
+            return None
+
+    async def drop_collection(self, name: str) -> bool:
+        """Drops a collection.
+
+        Returns:
+            bool: True if dropped, False otherwise.
+        """
+        if not await self._exists(name):
+            return False
+        try:
+            await self.db.drop_collection(name)
+            (await self._names()).discard(name)
+            return True
+        except PyMongoError as e:
+            print(f"Error dropping collection: {e}")
+            return False
+
+    async def get_collection(self, name: str) -> Optional[AsyncCollection]:
+        """Gets a collection by name, or None if it does not exist."""
+        if await self._exists(name):
+            return self.db[name]
+        return None
+
+    async def insert_one(self, collection_name: str, document: dict) -> Optional[Any]:
+        """Inserts a single document into a collection."""
+        coll = await self.get_collection(collection_name)
+        if coll is not None:
+            try:
+                return await coll.insert_one(document)
+            except PyMongoError as e:
+                print(f"Error inserting document: {e}")
+        return None
+
+    async def insert_many(self, collection_name: str, documents: List[dict], ordered: bool = True) -> Optional[Any]:
+        """Inserts multiple documents into a collection."""
+        coll = await self.get_collection(collection_name)
+        if coll is not None:
+            try:
+                return await coll.insert_many(documents, ordered=ordered)
+            except BulkWriteError as e:
+                print(f"Error inserting documents: {len(e.details.get('writeErrors', []))} rejected")
+                return e.details
+            except PyMongoError as e:
+                print(f"Error inserting documents: {e}")
+        return None
+
+    async def iter_find(self, collection_name: str, query: Optional[dict] = None, **options: Any) -> AsyncIterator[dict]:
+        """Streams the documents matching a query.
+
+        Args:
+            collection_name (str): Name of the collection.
+            query (dict, optional): Query filter. Defaults to every document.
+            **options: ``projection``, ``sort``, ``limit``, ``batch_size``,
+                ``hint`` and ``max_time_ms``, passed to ``find``.
+
+        Raises:
+            PyMongoError: If the query fails, even after some documents were yielded.
+        """
+        coll = await self.get_collection(collection_name)
+        if coll is None:
+            return
+        options = dict(options)
+        projection = options.pop("projection", None)
+        try:
+            async with coll.find(query or {}, projection, **options) as cursor:
+                async for document in cursor:
+                    yield document
+        except PyMongoError as e:
+            print(f"Error finding documents: {e}")
+            raise
+
+    async def find(self, collection_name: str, query: Optional[dict] = None, **options: Any) -> List[dict]:
+        """Finds documents in a collection; accepts the options of ``iter_find``."""
+        return [document async for document in self.iter_find(collection_name, query, **options)]
+
+    async def aggregate(self, collection_name: str, pipeline: List[dict], **options: Any) -> List[dict]:
+        """Runs an aggregation pipeline and returns its results."""
+        coll = await self.get_collection(collection_name)
+        if coll is None:
+            return []
+        try:
+            cursor = await coll.aggregate(pipeline, **options)
+            return await cursor.to_list()
+        except PyMongoError as e:
+            print(f"Error running aggregation: {e}")
+            return []
+
+    async def gather_limited(self, awaitables: Iterable[Awaitable[Any]], concurrency: Optional[int] = None) -> List[Any]:
+        """Awaits coroutines with at most ``concurrency`` running at once; results keep the input order."""
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def run(awaitable: Awaitable[Any]) -> Any:
+            async with semaphore:
+                return await awaitable
+
+        return await asyncio.gather(*(run(awaitable) for awaitable in awaitables))
+
+    async def insert_many_concurrently(
+        self,
+        batches: Sequence[Tuple[str, List[dict]]],
+        concurrency: Optional[int] = None,
+        ordered: bool = False,
+    ) -> List[Optional[Any]]:
+        """Runs several bulk inserts, e.g. one per monthly partition, concurrently.
+
+        Args:
+            batches (Sequence[Tuple[str, List[dict]]]): ``(collection_name, documents)`` pairs.
+            concurrency (int, optional): Writes in flight; defaults to the manager's limit.
+            ordered (bool): Whether each insert stops at its first error.
+
+        Returns:
+            List: One insert result (or error details / None) per batch.
+        """
+        return await self.gather_limited(
+            (self.insert_many(name, documents, ordered=ordered) for name, documents in batches),
+            concurrency,
+        )
+
+    async def bulk_write_concurrently(
+        self,
+        operations: Sequence[Tuple[str, List[Any]]],
+        concurrency: Optional[int] = None,
+        ordered: bool = False,
+    ) -> List[Optional[Any]]:
+        """Runs several ``bulk_write`` calls concurrently.
+
+        Args:
+            operations (Sequence[Tuple[str, List[Any]]]): ``(collection_name, requests)``
+                pairs, where requests are ``InsertOne``/``UpdateOne``/``DeleteMany``... models.
+            concurrency (int, optional): Writes in flight; defaults to the manager's limit.
+            ordered (bool): Whether each bulk write stops at its first error.
+        """
+        async def bulk_write(name: str, requests: List[Any]) -> Optional[Any]:
+            coll = await self.get_collection(name)
+            if coll is None:
+                return None
+            try:
+                return await coll.bulk_write(requests, ordered=ordered)
+            except BulkWriteError as e:
+                print(f"Error in bulk write on {name}: {len(e.details.get('writeErrors', []))} rejected")
+                return e.details
+            except PyMongoError as e:
+                print(f"Error in bulk write on {name}: {e}")
+                return None
+
+        return await self.gather_limited((bulk_write(name, requests) for name, requests in operations), concurrency)
+
+    async def aggregate_concurrently(
+        self,
+        pipelines: Sequence[Tuple[str, List[dict]]],
+        concurrency: Optional[int] = None,
+    ) -> List[List[dict]]:
+        """Runs several aggregation pipelines, e.g. one per station, concurrently.
+
+        Args:
+            pipelines (Sequence[Tuple[str, List[dict]]]): ``(collection_name, pipeline)`` pairs.
+            concurrency (int, optional): Pipelines in flight; defaults to the manager's limit.
+
+        Returns:
+            List[List[dict]]: Results of each pipeline, in input order.
+        """
+        return await self.gather_limited((self.aggregate(name, pipeline) for name, pipeline in pipelines), concurrency)
@@ -1,9 +1,36 @@
-from typing import Any, List, Optional
-from pymongo import MongoClient, collection
-from pymongo.errors import PyMongoError
-from settings import MONGODB_URI, MONGODB_DBNAME
+import heapq
+import itertools
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+import bson
+import pandas as pd
+from bson.codec_options import CodecOptions
+from pymongo import IndexModel, InsertOne, MongoClient, UpdateOne, collection
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
+from pymongo.write_concern import WriteConcern
+from settings import (
+    MONGODB_URI, MONGODB_DBNAME, MONGODB_COLLECTION, TRIP_INDEXES, TRIP_KEY_INDEX, TRIP_TIMESERIES,
+    MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE, MONGODB_COMPRESSORS,
+    WRITE_CONCERNS, COLLECTION_CACHE_TTL,
+)
+# settings puts the repository root on sys.path, so the shared config package is importable.
+from config.partitions import partition_months
 import logging
 
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Server error code of a unique index violation.
+DUPLICATE_KEY_ERROR = 11000
+
+_clients: Dict[tuple, MongoClient] = {}
+_clients_lock = threading.Lock()
+
 def setup_logging() -> None:
     """Configures logging for the downloader."""
     logging.basicConfig(
@@ -14,21 +41,100 @@ def setup_logging() -> None:
             logging.StreamHandler()
         ]
     )
+
+def get_client(uri: str, **options: Any) -> MongoClient:
+    """Returns a process-wide MongoClient for a URI and set of options.
+
+    MongoClient owns a connection pool and is thread-safe, so every manager
+    connecting with the same settings shares one client instead of opening
+    its own pool.
+
+    Args:
+        uri (str): MongoDB connection URI.
+        **options: MongoClient keyword options. Defaults to the pool size and
+            compressors from settings.
+    """
+    options = {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        **({"compressors": MONGODB_COMPRESSORS} if MONGODB_COMPRESSORS else {}),
+        **options,
+    }
+    key = (uri, tuple(sorted((k, str(v)) for k, v in options.items())))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = MongoClient(uri, **options)
+        return _clients[key]
+
+def close_clients() -> None:
+    """Closes every shared client, e.g. at process exit."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
 class MongoCollectionManager:
     """Class to manage MongoDB collections using PyMongo.
 
     Provides methods to create, delete, list, and use collections.
     """
 
-    def __init__(self, uri: str, db_name: str) -> None:
+    def __init__(
+        self,
+        uri: str,
+        db_name: str,
+        index_specs: Optional[Dict[str, List[dict]]] = None,
+        write_concern: str = "default",
+        cache_ttl: float = COLLECTION_CACHE_TTL,
+        metrics: Optional[Any] = None,
+        **client_options: Any,
+    ) -> None:
         """Initializes the MongoCollectionManager.
 
         Args:
             uri (str): MongoDB connection URI.
             db_name (str): Name of the database to use.
+            index_specs (Dict[str, List[dict]], optional): Declared indexes per
+                collection, as IndexModel ``keys`` plus options. Defaults to
+                ``TRIP_INDEXES`` for the trips collection.
+            write_concern (str): Preset from ``WRITE_CONCERNS`` ("default", "bulk" or "interactive").
+            cache_ttl (float): Seconds the collection names are cached.
+            metrics (Metrics, optional): Instrumentation sink with ``span`` and
+                ``inc`` (e.g. ``pipelines.metrics.Metrics``); nothing is recorded without one.
+            **client_options: Extra MongoClient options for the shared client.
         """
-        self.client = MongoClient(uri)
-        self.db = self.client[db_name]
+        self.client = get_client(uri, **client_options)
+        self.db = self.client.get_database(db_name, write_concern=WriteConcern(**WRITE_CONCERNS[write_concern]))
+        self.index_specs: Dict[str, List[dict]] = dict(index_specs or {MONGODB_COLLECTION: TRIP_INDEXES})
+        self.cache_ttl = cache_ttl
+        self._collection_names: Optional[Set[str]] = None
+        self._cached_at = 0.0
+        self.metrics = metrics
+
+    def _span(self, op: str, collection_name: str) -> ContextManager[dict]:
+        if self.metrics is None:
+            return nullcontext({})
+        return self.metrics.span("mongo_operation", op=op, collection=collection_name)
+
+    # Operations without a span count their failures here; spans count their own.
+    def _error(self, op: str, collection_name: str) -> None:
+        if self.metrics is not None:
+            self.metrics.inc("mongo_errors_total", op=op, collection=collection_name)
+
+    def invalidate_cache(self) -> None:
+        """Forgets the cached collection names; the next lookup asks the server."""
+        self._collection_names = None
+
+    def _names(self, refresh: bool = False) -> Set[str]:
+        expired = time.monotonic() - self._cached_at > self.cache_ttl
+        if refresh or expired or self._collection_names is None:
+            self._collection_names = set(self.db.list_collection_names())
+            self._cached_at = time.monotonic()
+        return self._collection_names
+
+    def _exists(self, name: str) -> bool:
+        # A miss may mean the collection was created elsewhere, so it is confirmed against the server.
+        return name in self._names() or name in self._names(refresh=True)
 
     def list_collections(self) -> List[str]:
         """Lists all collection names in the database.
@@ -36,25 +142,55 @@ class MongoCollectionManager:
         Returns:
             List[str]: List of collection names.
         """
-        return self.db.list_collection_names()
+        return sorted(self._names(refresh=True))
+
+    def collection_handle(self, name: str, write_concern: str = "default") -> collection.Collection:
+        """Gets a collection handle with a write concern preset, without checking it exists.
+
+        Args:
+            name (str): Name of the collection.
+            write_concern (str): Preset from ``WRITE_CONCERNS``.
+        """
+        return self.db.get_collection(name, write_concern=WriteConcern(**WRITE_CONCERNS[write_concern]))
 
-    def create_collection(self, name: str) -> Optional[collection.Collection]:
+    def create_collection(self, name: str, **options: Any) -> Optional[collection.Collection]:
         """Creates a new collection.
 
         Args:
             name (str): Name of the collection to create.
+            **options: ``create`` command options, e.g. ``timeseries`` or ``clusteredIndex``.
 
         Returns:
             Collection or None: The created collection or None if it exists.
         """
-        if name in self.db.list_collection_names():
+        if self._exists(name):
             return None
         try:
-            return self.db.create_collection(name)
+            created = self.db.create_collection(name, **options)
+            self._names().add(name)
+            return created
         except PyMongoError as e:
             print(f"Error creating collection: {e}")
+            self._error("create_collection", name)
             return None
 
+    def create_timeseries_collection(self, name: str, timeseries: Optional[dict] = None, expire_after_seconds: Optional[int] = None) -> Optional[collection.Collection]:
+        """Creates a time-series collection (MongoDB 5.0+).
+
+        Args:
+            name (str): Name of the collection to create.
+            timeseries (dict, optional): ``timeField``, ``metaField`` and
+                ``granularity``. Defaults to ``TRIP_TIMESERIES``.
+            expire_after_seconds (int, optional): Delete measurements older than this.
+
+        Returns:
+            Collection or None: The created collection or None if it exists.
+        """
+        options: Dict[str, Any] = {"timeseries": timeseries or TRIP_TIMESERIES}
+        if expire_after_seconds is not None:
+            options["expireAfterSeconds"] = expire_after_seconds
+        return self.create_collection(name, **options)
+
     def drop_collection(self, name: str) -> bool:
         """Drops a collection.
 
@@ -64,13 +200,15 @@ class MongoCollectionManager:
         Returns:
             bool: True if dropped, False otherwise.
         """
-        if name not in self.db.list_collection_names():
+        if not self._exists(name):
             return False
         try:
             self.db.drop_collection(name)
+            self._names().discard(name)
             return True
         except PyMongoError as e:
             print(f"Error dropping collection: {e}")
+            self._error("drop_collection", name)
             return False
 
     def get_collection(self, name: str) -> Optional[collection.Collection]:
@@ -82,7 +220,7 @@ class MongoCollectionManager:
         Returns:
             Collection or None: The collection object or None if not found.
         """
-        if name in self.db.list_collection_names():
+        if self._exists(name):
             return self.db[name]
         return None
 
@@ -99,7 +237,8 @@ class MongoCollectionManager:
         coll = self.get_collection(collection_name)
         if coll is not None:
             try:
-                return coll.insert_one(document)
+                with self._span("insert_one", collection_name):
+                    return coll.insert_one(document)
             except PyMongoError as e:
                 print(f"Error inserting document: {e}")
         return None
@@ -117,26 +256,430 @@ class MongoCollectionManager:
         coll = self.get_collection(collection_name)
         if coll is not None:
             try:
-                return coll.insert_many(documents)
+                with self._span("insert_many", collection_name) as span:
+                    span["documents"] = len(documents)
+                    return coll.insert_many(documents)
             except PyMongoError as e:
                 print(f"Error inserting documents: {e}")
         return None
 
-    def find(self, collection_name: str, query: dict = {}) -> List[dict]:
+    def insert_many_unique(self, collection_name: str, documents: List[dict]) -> int:
+        """Inserts documents unordered, skipping those that violate a unique index.
+
+        With the ``trip_key`` index (``ensure_trip_key_index``) this makes a
+        reload idempotent: trips already stored are rejected by the server in
+        the same round trip instead of being looked up one by one.
+
+        Args:
+            collection_name (str): Name of the collection.
+            documents (List[dict]): Documents to insert.
+
+        Returns:
+            int: Number of documents inserted.
+        """
+        coll = self.collection_handle(collection_name)
+        try:
+            with self._span("insert_many_unique", collection_name) as span:
+                span["documents"] = len(documents)
+                return len(coll.insert_many(documents, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            others = [error for error in errors if error.get("code") != DUPLICATE_KEY_ERROR]
+            if others:
+                print(f"Error inserting documents: {others[0].get('errmsg')} ({len(others)} errors)")
+            return e.details.get("nInserted", 0)
+        except PyMongoError as e:
+            print(f"Error inserting documents: {e}")
+        return 0
+
+    def upsert_many(self, collection_name: str, documents: List[dict], key: str = "trip_key") -> Optional[Any]:
+        """Inserts the documents whose ``key`` is not stored yet and leaves the others untouched.
+
+        Each document becomes an upsert with ``$setOnInsert``, sent in one
+        unordered bulk write; documents without the key are inserted as is.
+        The key should have a unique index so concurrent loads cannot race.
+
+        Args:
+            collection_name (str): Name of the collection.
+            documents (List[dict]): Documents to upsert.
+            key (str): Field that identifies a document.
+
+        Returns:
+            BulkWriteResult or None: ``upserted_count`` is the number of new documents.
+        """
+        requests = [
+            UpdateOne({key: document[key]}, {"$setOnInsert": document}, upsert=True)
+            if document.get(key) is not None else InsertOne(document)
+            for document in documents
+        ]
+        if not requests:
+            return None
+        try:
+            with self._span("upsert_many", collection_name) as span:
+                span["documents"] = len(requests)
+                return self.collection_handle(collection_name).bulk_write(requests, ordered=False)
+        except PyMongoError as e:
+            print(f"Error upserting documents: {e}")
+        return None
+
+    def ensure_trip_key_index(self, collection_name: str = MONGODB_COLLECTION) -> Optional[str]:
+        """Builds the unique ``trip_key`` index now, so it guards the next load rather than following it.
+
+        Returns:
+            str or None: Name of the index, or None if it could not be built
+            (e.g. the collection already holds duplicate keys).
+        """
+        spec = TRIP_KEY_INDEX
+        try:
+            return self.collection_handle(collection_name).create_index(spec["keys"], **{k: v for k, v in spec.items() if k != "keys"})
+        except PyMongoError as e:
+            print(f"Error creating the trip key index: {e}")
+            self._error("create_index", collection_name)
+            return None
+
+    def _cursor(
+        self,
+        collection_name: str,
+        query: Optional[dict] = None,
+        projection: Optional[Union[List[str], dict]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        batch_size: Optional[int] = None,
+        hint: Optional[Union[str, List[Tuple[str, int]]]] = None,
+        max_time_ms: Optional[int] = None,
+        raw_batches: bool = False,
+    ):
+        coll = self.get_collection(collection_name)
+        if coll is None:
+            return None
+        find = coll.find_raw_batches if raw_batches else coll.find
+        cursor = find(query or {}, projection, sort=sort, limit=limit)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        if hint is not None:
+            cursor = cursor.hint(hint)
+        if max_time_ms is not None:
+            cursor = cursor.max_time_ms(max_time_ms)
+        return cursor
+
+    def iter_find(self, collection_name: str, query: Optional[dict] = None, **options: Any) -> Iterator[dict]:
+        """Streams the documents matching a query instead of loading them all.
+
+        Args:
+            collection_name (str): Name of the collection.
+            query (dict, optional): Query filter. Defaults to every document.
+            **options: ``projection``, ``sort``, ``limit``, ``batch_size``,
+                ``hint`` and ``max_time_ms``, passed to the cursor.
+
+        Yields:
+            dict: Documents as they arrive from the server, one batch at a time.
+
+        Raises:
+            PyMongoError: If the query fails, even after some documents were
+                yielded, so a truncated result is never taken for a complete one.
+        """
+        try:
+            cursor = self._cursor(collection_name, query, **options)
+            if cursor is None:
+                return
+            with cursor:
+                yield from cursor
+        except PyMongoError as e:
+            print(f"Error finding documents: {e}")
+            self._error("find", collection_name)
+            raise
+
+    def find(self, collection_name: str, query: dict = {}, **options: Any) -> List[dict]:
         """Finds documents in a collection.
 
         Args:
             collection_name (str): Name of the collection.
             query (dict, optional): Query filter. Defaults to {}.
+            **options: Cursor options accepted by ``iter_find``.
 
         Returns:
             List[dict]: List of documents found.
+
+        Raises:
+            PyMongoError: If the query fails.
+        """
+        return list(self.iter_find(collection_name, query, **options))
+
+    def iter_find_frames(
+        self,
+        collection_name: str,
+        query: Optional[dict] = None,
+        projection: Optional[Union[List[str], dict]] = None,
+        chunk_size: int = 100_000,
+        columns: Optional[Sequence[str]] = None,
+        **options: Any,
+    ) -> Iterator[pd.DataFrame]:
+        """Streams a query as DataFrames of up to ``chunk_size`` rows.
+
+        Documents are fetched as raw BSON batches and each batch is decoded
+        with a single ``bson.decode_all`` call. Pass a projection to pull only
+        the fields the analysis needs.
+
+        Args:
+            collection_name (str): Name of the collection.
+            query (dict, optional): Query filter.
+            projection (List[str] or dict, optional): Fields to return.
+            chunk_size (int): Rows per DataFrame.
+            columns (Sequence[str], optional): Column order; defaults to the
+                projected fields (or the fields of the first document).
+            **options: ``sort``, ``limit``, ``batch_size``, ``hint`` and ``max_time_ms``.
+
+        Yields:
+            pd.DataFrame: Consecutive chunks of the result set.
+
+        Raises:
+            PyMongoError: If the query fails; rows already fetched are not yielded.
+        """
+        if columns is None and projection is not None:
+            fields = projection if isinstance(projection, list) else [k for k, v in projection.items() if v]
+            columns = fields if "_id" in fields or (isinstance(projection, dict) and projection.get("_id") == 0) else ["_id", *fields]
+        codec_options = CodecOptions(tz_aware=False)
+        docs: List[dict] = []
+        try:
+            cursor = self._cursor(collection_name, query, projection, raw_batches=True, **options)
+            if cursor is None:
+                return
+            batches = cursor if self.metrics is None else self.metrics.timed(cursor, "mongo_fetch_batch", collection=collection_name)
+            with cursor:
+                for batch in batches:
+                    docs.extend(bson.decode_all(batch, codec_options))
+                    while len(docs) >= chunk_size:
+                        yield pd.DataFrame.from_records(docs[:chunk_size], columns=columns)
+                        del docs[:chunk_size]
+        except PyMongoError as e:
+            print(f"Error finding documents: {e}")
+            self._error("find_frames", collection_name)
+            raise
+        if docs:
+            yield pd.DataFrame.from_records(docs, columns=columns)
+
+    def iter_find_arrow(self, collection_name: str, query: Optional[dict] = None, **options: Any) -> Iterator["pa.Table"]:
+        """Streams a query as Arrow tables; same arguments as ``iter_find_frames``.
+
+        ObjectId values are converted to strings, which Arrow can store.
+        """
+        if pa is None:
+            raise ImportError("pyarrow is required for Arrow results.")
+        for df in self.iter_find_frames(collection_name, query, **options):
+            if "_id" in df.columns:
+                df["_id"] = df["_id"].astype(str)
+            yield pa.Table.from_pandas(df, preserve_index=False)
+
+    def find_frame(self, collection_name: str, query: Optional[dict] = None, **options: Any) -> pd.DataFrame:
+        """Runs a query into a single DataFrame; same arguments as ``iter_find_frames``."""
+        frames = list(self.iter_find_frames(collection_name, query, **options))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=options.get("columns"))
+
+    def register_indexes(self, collection_name: str, specs: List[dict]) -> None:
+        """Declares the indexes a collection should have.
+
+        Args:
+            collection_name (str): Name of the collection.
+            specs (List[dict]): Index specs, e.g. ``{"keys": [("bike_id", 1)], "unique": True}``.
+        """
+        self.index_specs[collection_name] = list(specs)
+
+    def create_indexes(self, collection_name: str, background: bool = True) -> List[str]:
+        """Builds the declared indexes of a collection, typically after a bulk load.
+
+        Args:
+            collection_name (str): Name of the collection.
+            background (bool): Request a background build (ignored by MongoDB 4.2+,
+                which always uses an optimized build that does not block the collection).
+
+        Returns:
+            List[str]: Names of the indexes created or already present.
         """
         coll = self.get_collection(collection_name)
-        if coll is not None:
+        specs = self.index_specs.get(collection_name, [])
+        if coll is None or not specs:
+            return []
+        # A spec's own "background" wins over the argument.
+        models = [
+            IndexModel(spec["keys"], **{"background": background, **{k: v for k, v in spec.items() if k != "keys"}})
+            for spec in specs
+        ]
+        try:
+            return coll.create_indexes(models)
+        except PyMongoError as e:
+            print(f"Error creating indexes: {e}")
+            self._error("create_indexes", collection_name)
+            return []
+
+    def drop_indexes(self, collection_name: str, keep: Optional[List[str]] = None) -> List[str]:
+        """Drops the secondary indexes of a collection, e.g. before a bulk load.
+
+        Args:
+            collection_name (str): Name of the collection.
+            keep (List[str], optional): Index names to keep besides ``_id_``.
+
+        Returns:
+            List[str]: Names of the dropped indexes.
+        """
+        coll = self.get_collection(collection_name)
+        if coll is None:
+            return []
+        keep = {"_id_", *(keep or [])}
+        dropped = []
+        try:
+            for name in coll.index_information():
+                if name not in keep:
+                    coll.drop_index(name)
+                    dropped.append(name)
+        except PyMongoError as e:
+            print(f"Error dropping indexes: {e}")
+            self._error("drop_indexes", collection_name)
+        return dropped
+
+    def list_indexes(self, collection_name: str) -> Dict[str, dict]:
+        """Lists the indexes of a collection.
+
+        Returns:
+            Dict[str, dict]: Index name to index information (keys and options).
+        """
+        coll = self.get_collection(collection_name)
+        return coll.index_information() if coll is not None else {}
+
+    def index_stats(self, collection_name: str) -> List[dict]:
+        """Returns the ``$indexStats`` of a collection: per index, how often it was used since the server started.
+
+        Returns:
+            List[dict]: One document per index with ``name``, ``key`` and ``accesses``.
+        """
+        coll = self.get_collection(collection_name)
+        if coll is None:
+            return []
+        try:
+            return list(coll.aggregate([{"$indexStats": {}}]))
+        except OperationFailure as e:
+            print(f"Error reading index stats: {e}")
+            return []
+
+    def unused_indexes(self, collection_name: str, min_ops: int = 0) -> List[str]:
+        """Names of the secondary indexes used at most ``min_ops`` times since the server started."""
+        return [
+            stats["name"]
+            for stats in self.index_stats(collection_name)
+            if stats["name"] != "_id_" and stats["accesses"]["ops"] <= min_ops
+        ]
+
+    def partitions(self, base_name: str) -> Dict[str, str]:
+        """Months of a collection partitioned by month (see ``PartitionedLoader``), mapped to their collection names."""
+        return partition_months(self._names(refresh=True), base_name)
+
+    def partitions_for_range(self, base_name: str, start: datetime, end: datetime) -> List[str]:
+        """Collections of the months that overlap ``[start, end)``, in month order."""
+        first, last = f"{start:%Y-%m}", f"{end:%Y-%m}"
+        return [name for month, name in self.partitions(base_name).items() if first <= month <= last]
+
+    def swap_collection(self, source: str, target: str) -> bool:
+        """Atomically renames ``source`` over ``target``, dropping the old target.
+
+        Returns:
+            bool: True if swapped, False otherwise.
+        """
+        try:
+            self.db[source].rename(target, dropTarget=True)
+        except PyMongoError as e:
+            print(f"Error swapping collection: {e}")
+            return False
+        names = self._names()
+        names.discard(source)
+        names.add(target)
+        return True
+
+    def find_range(
+        self,
+        base_name: str,
+        start: datetime,
+        end: datetime,
+        query: Optional[dict] = None,
+        time_field: str = "start_timestamp",
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        **options: Any,
+    ) -> Iterator[dict]:
+        """Queries a date range of a month-partitioned collection.
+
+        Only the partitions that overlap the range are queried. Without a sort
+        their results are chained in month order; with a sort each partition is
+        sorted by the server and the streams are merged, so the limit applies
+        to the merged result.
+
+        Args:
+            base_name (str): Name of the partitioned collection, e.g. ``trips``.
+            start (datetime): Inclusive start of the range.
+            end (datetime): Exclusive end of the range.
+            query (dict, optional): Extra filter applied to every partition.
+            time_field (str): Field the range applies to.
+            sort (List[Tuple[str, int]], optional): Sort keys, all in the same direction.
+            limit (int): Maximum number of documents; 0 means no limit.
+            **options: Other ``iter_find`` options (projection, batch_size, hint, max_time_ms).
+
+        Yields:
+            dict: Matching documents.
+        """
+        if sort and len({direction for _, direction in sort}) > 1:
+            raise ValueError("Merging partitions supports sort keys in a single direction.")
+        query = {**(query or {}), time_field: {"$gte": start, "$lt": end}}
+        streams = [
+            self.iter_find(name, query, sort=sort, limit=limit, **options)
+            for name in self.partitions_for_range(base_name, start, end)
+        ]
+        if sort:
+            fields = [field for field, _ in sort]
+            # Missing and null values sort first, as on the server, and are never compared with other values.
+            merged = heapq.merge(
+                *streams,
+                key=lambda doc: tuple((doc.get(field) is not None, doc.get(field)) for field in fields),
+                reverse=sort[0][1] < 0,
+            )
+        else:
+            merged = itertools.chain(*streams)
+        return itertools.islice(merged, limit) if limit else merged
+
+    def count_range(self, base_name: str, start: datetime, end: datetime, query: Optional[dict] = None, time_field: str = "start_timestamp") -> int:
+        """Counts the documents of a date range across the partitions that overlap it."""
+        query = {**(query or {}), time_field: {"$gte": start, "$lt": end}}
+        total = 0
+        for name in self.partitions_for_range(base_name, start, end):
             try:
-                return list(coll.find(query))
+                total += self.db[name].count_documents(query)
             except PyMongoError as e:
-                print(f"Error finding documents: {e}")
-        return []
+                print(f"Error counting documents in {name}: {e}")
+        return total
 
+    def nearest_stations(self, longitude: float, latitude: float, limit: int = 5, max_distance_m: Optional[float] = None, collection_name: str = "stations") -> List[dict]:
+        """Finds the stations closest to a point, nearest first.
+
+        Needs the ``2dsphere`` index on ``location`` that
+        ``pipelines.load.stations.load_stations`` creates.
+
+        Args:
+            longitude (float): Longitude of the point.
+            latitude (float): Latitude of the point.
+            limit (int): Maximum number of stations.
+            max_distance_m (float, optional): Ignore stations farther than this, in meters.
+            collection_name (str): Name of the stations collection.
+
+        Returns:
+            List[dict]: Station documents with their ``distance_m`` from the point.
+        """
+        geo_near = {
+            "near": {"type": "Point", "coordinates": [longitude, latitude]},
+            "distanceField": "distance_m",
+            "spherical": True,
+        }
+        if max_distance_m is not None:
+            geo_near["maxDistance"] = max_distance_m
+        try:
+            with self._span("nearest_stations", collection_name):
+                return list(self.db[collection_name].aggregate([{"$geoNear": geo_near}, {"$limit": limit}]))
+        except PyMongoError as e:
+            print(f"Error finding nearest stations: {e}")
+        return []
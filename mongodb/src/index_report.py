@@ -0,0 +1,34 @@
+import logging
+
+from settings import MONGODB_URI, MONGODB_DBNAME
+from collection import MongoCollectionManager, setup_logging
+
+
+def main() -> None:
+    """Reports index usage ($indexStats) and unused indexes for every collection."""
+    setup_logging()
+    manager = MongoCollectionManager(MONGODB_URI, MONGODB_DBNAME)
+
+    for collection_name in manager.list_collections():
+        stats = manager.index_stats(collection_name)
+        if not stats:
+            continue
+        logging.info(f"Collection: {collection_name}")
+        for index in sorted(stats, key=lambda s: s["accesses"]["ops"], reverse=True):
+            logging.info(
+                f"  {index['name']}: {index['accesses']['ops']} ops since {index['accesses']['since']} "
+                f"(keys: {dict(index['key'])})"
+            )
+        unused = manager.unused_indexes(collection_name)
+        if unused:
+            logging.info(f"  Unused indexes: {', '.join(unused)}")
+
+        declared = manager.index_specs.get(collection_name, [])
+        existing = {tuple(info["key"]) for info in manager.list_indexes(collection_name).values()}
+        missing = [spec["keys"] for spec in declared if tuple(map(tuple, spec["keys"])) not in existing]
+        if missing:
+            logging.info(f"  Declared but missing indexes: {missing}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,3 +16,31 @@ MONGODB_DBNAME = os.getenv("MONGODB_DBNAME")
 if not MONGODB_DBNAME:
     print("Error: MONGODB_DBNAME environment variable is not set.")
     sys.exit(1)
+
+# Connection pool and wire compression (the driver defaults unless set). Compressors
+# are tried in order, e.g. "zstd,zlib"; zstd needs the `zstandard` package and
+# snappy needs `python-snappy`.
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", 100))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", 0))
+MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS")
+
+# Write concern presets: "default" defers to the server and connection string,
+# "bulk" favours ingest throughput, "interactive" durability.
+WRITE_CONCERNS = {
+    "default": {},
+    "bulk": {"w": 1, "j": False},
+    "interactive": {"w": "majority", "j": True},
+}
+
+# Seconds the list of collection names is cached by MongoCollectionManager.
+COLLECTION_CACHE_TTL = float(os.getenv("COLLECTION_CACHE_TTL", 30))
+
+# Name of the collection that holds the trips loaded by the pipeline.
+MONGODB_COLLECTION = os.getenv("MONGODB_COLLECTION", "trips")
+
+# Shared project settings (e.g. index specs) live in the top-level config package.
+ROOT_DIR = Path(__file__).resolve().parents[2]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from config.settings import TRIP_INDEXES, TRIP_KEY_INDEX, TRIP_TIMESERIES
@@ -0,0 +1,281 @@
+import os
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .extract.cache import ColumnarCache
+from .extract.extraction import EcobiciDataExtractor
+from .parallel import make_executor, worker_error
+from .transform.enrichment import TripEnricher
+from .transform.transformation import EcobiciDataTransformer
+from .transform.validation import MAX_STATION_ID, TripValidator
+
+# OD pairs are keyed as start * STATION_SPAN + end, which fits an int64 for UInt16 station ids.
+STATION_SPAN = MAX_STATION_ID + 1
+HOURS = 24
+
+
+class KeyedSums:
+    """Trip counts and duration sums per int64 key, kept as a sparse vector.
+
+    ``keys`` are unique; ``trips``, ``timed`` (trips with a known duration)
+    and ``seconds`` are aligned with them. Partials from different chunks or
+    months combine with ``+`` whatever their keys.
+    """
+
+    __slots__ = ("keys", "trips", "timed", "seconds")
+
+    def __init__(self, keys: Optional[np.ndarray] = None, trips: Optional[np.ndarray] = None, timed: Optional[np.ndarray] = None, seconds: Optional[np.ndarray] = None):
+        self.keys = keys if keys is not None else np.empty(0, dtype=np.int64)
+        self.trips = trips if trips is not None else np.empty(0, dtype=np.int64)
+        self.timed = timed if timed is not None else np.empty(0, dtype=np.int64)
+        self.seconds = seconds if seconds is not None else np.empty(0, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def count(cls, keys: np.ndarray, seconds: np.ndarray) -> "KeyedSums":
+        """Aggregates one row per trip; ``seconds`` is NaN where the duration is unknown."""
+        codes, uniques = pd.factorize(keys)
+        size = len(uniques)
+        timed = ~np.isnan(seconds)
+        return cls(
+            np.asarray(uniques, dtype=np.int64),
+            np.bincount(codes, minlength=size),
+            np.bincount(codes, weights=timed, minlength=size).astype(np.int64),
+            np.bincount(codes, weights=np.where(timed, seconds, 0.0), minlength=size),
+        )
+
+    @classmethod
+    def combine(cls, parts: Iterable["KeyedSums"]) -> "KeyedSums":
+        """Merges any number of partials in one pass."""
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls()
+        if len(parts) == 1:
+            return parts[0]
+        codes, uniques = pd.factorize(np.concatenate([part.keys for part in parts]))
+        size = len(uniques)
+
+        def add(name: str) -> np.ndarray:
+            return np.bincount(codes, weights=np.concatenate([getattr(part, name) for part in parts]), minlength=size)
+
+        return cls(np.asarray(uniques, dtype=np.int64), add("trips").astype(np.int64), add("timed").astype(np.int64), add("seconds"))
+
+    def __add__(self, other: "KeyedSums") -> "KeyedSums":
+        return KeyedSums.combine([self, other])
+
+    def avg_minutes(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.timed > 0, self.seconds / np.maximum(self.timed, 1) / 60, np.nan)
+
+
+def trip_seconds(df: pd.DataFrame) -> np.ndarray:
+    """Trip durations as float seconds, NaN when unknown; reuses ``duration_s`` when enriched."""
+    durations = df["duration_s"].array if "duration_s" in df else TripEnricher.durations(df)
+    return durations.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _ids(series: pd.Series) -> np.ndarray:
+    return series.to_numpy(dtype=np.int64, na_value=-1)
+
+
+class TripAnalytics:
+    """Mergeable partial results of the demand queries, computed in one pass over transformed trips.
+
+    * ``od``: trips and duration per origin-destination pair.
+    * ``departures``/``arrivals``: trips per station and hour of day.
+    * ``bikes``: trips and time ridden per bike.
+
+    Each is a ``KeyedSums`` built with ``pd.factorize`` and ``np.bincount``,
+    so a chunk costs a few vectorized passes and partials for different
+    chunks or months add up exactly. Chunk partials are merged lazily, once,
+    before they are read or pickled. This answers the same questions as the
+    ``$group`` pipelines in ``MONGO_PIPELINES`` without loading into MongoDB.
+    """
+
+    TABLES = ("od", "departures", "arrivals", "bikes")
+
+    def __init__(self):
+        self.rows = 0
+        self.months: Set[str] = set()
+        self._parts: Dict[str, List[KeyedSums]] = {table: [] for table in self.TABLES}
+
+    def __getstate__(self):
+        self.compact()
+        return self.__dict__.copy()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "TripAnalytics":
+        return cls().update(df)
+
+    def update(self, df: pd.DataFrame) -> "TripAnalytics":
+        """Adds one chunk of transformed trips."""
+        if df.empty:
+            return self
+        self.rows += len(df)
+        if "source_month" in df:
+            self.months.update(str(month) for month in df["source_month"].dropna().unique())
+        seconds = trip_seconds(df)
+        start, end = _ids(df["start_station_id"]), _ids(df["end_station_id"])
+        tables = {"od": ((start >= 0) & (end >= 0), start * STATION_SPAN + end)}
+        for table, stations, minutes in (("departures", start, df["start_time"]), ("arrivals", end, df["end_time"])):
+            hour = _ids(minutes) // 60
+            tables[table] = ((stations >= 0) & (hour >= 0), stations * HOURS + hour)
+        bike = _ids(df["bike_id"])
+        tables["bikes"] = (bike >= 0, bike)
+        for table, (valid, keys) in tables.items():
+            self._parts[table].append(KeyedSums.count(keys[valid], seconds[valid]))
+        return self
+
+    def compact(self) -> "TripAnalytics":
+        for table, parts in self._parts.items():
+            if len(parts) > 1:
+                self._parts[table] = [KeyedSums.combine(parts)]
+        return self
+
+    def table(self, name: str) -> KeyedSums:
+        self.compact()
+        parts = self._parts[name]
+        return parts[0] if parts else KeyedSums()
+
+    @classmethod
+    def combine(cls, partials: Iterable["TripAnalytics"]) -> "TripAnalytics":
+        """Merges partials, e.g. one per month computed in separate workers."""
+        combined = cls()
+        for partial in partials:
+            combined.rows += partial.rows
+            combined.months |= partial.months
+            for table in cls.TABLES:
+                combined._parts[table].extend(partial._parts[table])
+        return combined.compact()
+
+    def __add__(self, other: "TripAnalytics") -> "TripAnalytics":
+        return TripAnalytics.combine([self, other])
+
+    def od_frame(self) -> pd.DataFrame:
+        """Trips and average duration per origin-destination pair, busiest first."""
+        od = self.table("od")
+        return pd.DataFrame({
+            "start_station_id": od.keys // STATION_SPAN,
+            "end_station_id": od.keys % STATION_SPAN,
+            "trips": od.trips,
+            "avg_duration_min": od.avg_minutes(),
+        }).sort_values(["trips", "start_station_id", "end_station_id"], ascending=[False, True, True], ignore_index=True)
+
+    def top_od(self, n: int = 10) -> pd.DataFrame:
+        return self.od_frame().head(n)
+
+    def od_matrix(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Dense trip counts between the stations seen, with those station ids as both axes."""
+        od = self.table("od")
+        stations, codes = np.unique(np.concatenate([od.keys // STATION_SPAN, od.keys % STATION_SPAN]), return_inverse=True)
+        size = len(stations)
+        matrix = np.bincount(codes[:len(od)] * size + codes[len(od):], weights=od.trips, minlength=size * size)
+        return stations, matrix.astype(np.int64).reshape(size, size)
+
+    def hourly_frame(self) -> pd.DataFrame:
+        """Departures and arrivals per station and hour of day."""
+        frames = []
+        for name in ("departures", "arrivals"):
+            sums = self.table(name)
+            frames.append(pd.Series(sums.trips, index=pd.MultiIndex.from_arrays([sums.keys // HOURS, sums.keys % HOURS], names=["station_id", "hour"]), name=name))
+        return pd.concat(frames, axis=1).fillna(0).astype(np.int64).sort_index().reset_index()
+
+    def bike_frame(self) -> pd.DataFrame:
+        """Trips and hours ridden per bike, most used first."""
+        bikes = self.table("bikes")
+        return pd.DataFrame({
+            "bike_id": bikes.keys,
+            "trips": bikes.trips,
+            "hours_ridden": bikes.seconds / 3600,
+        }).sort_values(["trips", "bike_id"], ascending=[False, True], ignore_index=True)
+
+    def write(self, directory: str) -> List[Path]:
+        """Saves the OD, hourly and bike tables as Parquet files."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for name, frame in (("od", self.od_frame()), ("station_hourly", self.hourly_frame()), ("bikes", self.bike_frame())):
+            path = directory / f"{name}.parquet"
+            frame.to_parquet(path, index=False)
+            paths.append(path)
+        return paths
+
+
+def analyze_file(source: str, subfolder: str, file_path: Path, cache: Optional[ColumnarCache] = None, validator: Optional[TripValidator] = None) -> Tuple[TripAnalytics, Optional[Dict[str, Dict[str, int]]]]:
+    """Streams one month through the transform into its partial, one chunk at a time.
+
+    The month is never held in memory as a whole; only the partial and the
+    quality counts of the file go back to the parent.
+    """
+    file_validator = validator.spawn() if validator is not None else None
+    extractor = EcobiciDataExtractor(source, subfolder, cache=cache)
+    transformer = EcobiciDataTransformer(validator=file_validator)
+    analytics = TripAnalytics()
+    for chunk in transformer.transform_chunks(extractor.iter_file_chunks(file_path)):
+        analytics.update(chunk)
+    return analytics.compact(), file_validator.counts if file_validator is not None else None
+
+
+def analyze_files(extractor: EcobiciDataExtractor, file_paths: Iterable[Path], max_workers: Optional[int] = 4, executor: str = "process", validator: Optional[TripValidator] = None) -> TripAnalytics:
+    """Computes the analytics of every month in a worker pool and merges the partials.
+
+    Partials are merged as they complete, since the result does not depend
+    on the order. With process workers only the partials cross process
+    boundaries, never the trips. Quality counts of the workers are merged
+    into ``validator``.
+
+    Raises:
+        RuntimeError: If any file failed, once the other files are done.
+    """
+    max_workers = max_workers or os.cpu_count()
+    partials = []
+    failed = []
+    with make_executor(executor, max_workers) as pool:
+        futures = {pool.submit(analyze_file, extractor.source, extractor.subfolder, file_path, extractor.cache, validator): file_path for file_path in file_paths}
+        for future in as_completed(futures):
+            try:
+                partial, counts = future.result()
+            except Exception as e:
+                worker_error(extractor.metrics, futures[future], e)
+                failed.append(futures[future].name)
+                continue
+            partials.append(partial)
+            if counts and validator is not None:
+                validator.merge(counts)
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(futures)} files could not be analyzed: {', '.join(sorted(failed))}")
+    return TripAnalytics.combine(partials)
+
+
+# The equivalent MongoDB aggregations over a flat trips collection, for comparison.
+MONGO_PIPELINES = {
+    "od": [
+        {"$match": {"start_station_id": {"$ne": None}, "end_station_id": {"$ne": None}}},
+        {"$group": {"_id": {"start_station_id": "$start_station_id", "end_station_id": "$end_station_id"}, "trips": {"$sum": 1}}},
+    ],
+    "departures": [
+        {"$match": {"start_station_id": {"$ne": None}, "start_time": {"$ne": None}}},
+        {"$group": {"_id": {"station_id": "$start_station_id", "hour": {"$floor": {"$divide": ["$start_time", 60]}}}, "trips": {"$sum": 1}}},
+    ],
+    "arrivals": [
+        {"$match": {"end_station_id": {"$ne": None}, "end_time": {"$ne": None}}},
+        {"$group": {"_id": {"station_id": "$end_station_id", "hour": {"$floor": {"$divide": ["$end_time", 60]}}}, "trips": {"$sum": 1}}},
+    ],
+    "bikes": [
+        {"$match": {"bike_id": {"$ne": None}}},
+        {"$group": {"_id": "$bike_id", "trips": {"$sum": 1}}},
+    ],
+}
@@ -1 +1,2 @@
-from .extraction import *
\ No newline at end of file
+from .extraction import *
+from .cache import *
@@ -0,0 +1,52 @@
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+# Yearly archives written by ecobici/zip_ecobici.py: <year>.zip with <year>/<YYYY-MM>.csv members.
+ARCHIVE_SUFFIX = ".zip"
+
+
+def archive_member(file_path: Path) -> Optional[Tuple[Path, str]]:
+    """Splits ``<archive>.zip/<member>`` into the archive and the member name, or None for a plain file.
+
+    CSVs inside an archive are addressed as if the archive were a folder, so
+    ``file_path.stem`` is still the month and ``file_path.name`` the CSV name.
+    """
+    file_path = Path(file_path)
+    for parent in file_path.parents:
+        if parent.suffix == ARCHIVE_SUFFIX and parent.is_file():
+            return parent, file_path.relative_to(parent).as_posix()
+    return None
+
+
+def list_archive_csvs(archive: Path) -> List[Path]:
+    """CSV members of an archive, as ``<archive>/<member>`` paths."""
+    with zipfile.ZipFile(archive) as zf:
+        return [Path(archive) / name for name in zf.namelist() if name.lower().endswith(".csv")]
+
+
+def member_info(file_path: Path) -> zipfile.ZipInfo:
+    archive, name = archive_member(file_path)
+    with zipfile.ZipFile(archive) as zf:
+        return zf.getinfo(name)
+
+
+@contextmanager
+def open_source(file_path: Path) -> Iterator[BinaryIO]:
+    """Opens a CSV for binary reading; archive members are decompressed as they are read, never extracted."""
+    member = archive_member(file_path)
+    if member is None:
+        with open(file_path, "rb") as f:
+            yield f
+        return
+    archive, name = member
+    with zipfile.ZipFile(archive) as zf, zf.open(name) as f:
+        yield f
+
+
+def source_size(file_path: Path) -> int:
+    """Uncompressed size of a CSV, whether loose or inside an archive."""
+    if archive_member(file_path) is None:
+        return Path(file_path).stat().st_size
+    return member_info(file_path).file_size
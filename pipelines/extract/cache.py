@@ -0,0 +1,180 @@
+import logging
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Bump when the normalization or transformation output changes so stale caches are rebuilt.
+CACHE_VERSION = "4"
+
+
+class ColumnarCache:
+    """Arrow IPC (Feather v2) cache of normalized or transformed monthly files.
+
+    Each ``<month>.csv`` gets ``<month>.<kind>.feather`` files next to it, where
+    ``kind`` is ``normalized`` (output of ``standardize_columns``),
+    ``transformed`` (output of ``transform_data``) or ``validated`` (the
+    transformed rows that passed the data-quality rules). Columns keep the
+    dtypes declared in ``CSV_DTYPES``/``TRIP_SCHEMA``, with categoricals stored
+    as Arrow dictionaries, so a cache hit returns the same frames as a cold
+    read. Files are written uncompressed so they can be memory-mapped, and
+    they record the size and mtime of their source CSV; a cache entry is only
+    reused while the CSV is unchanged. A ``tag`` (e.g. the fingerprint of the validation rules) is
+    recorded too, and an entry is only reused under the same tag.
+    """
+
+    def __init__(self, kinds=("normalized", "transformed", "validated")):
+        if pa is None:
+            raise ImportError("pyarrow is required for the columnar cache.")
+        self.kinds = kinds
+
+    @staticmethod
+    def cache_path(file_path: Path, kind: str = "normalized") -> Path:
+        return file_path.with_name(f"{file_path.stem}.{kind}.feather")
+
+    @staticmethod
+    def _source_metadata(file_path: Path, tag: str = "") -> dict:
+        stat = os.stat(file_path)
+        return {
+            b"source_size": str(stat.st_size).encode(),
+            b"source_mtime_ns": str(stat.st_mtime_ns).encode(),
+            b"cache_version": CACHE_VERSION.encode(),
+            b"cache_tag": tag.encode(),
+        }
+
+    def is_fresh(self, file_path: Path, kind: str = "normalized", tag: str = "") -> bool:
+        if kind not in self.kinds:
+            return False
+        path = self.cache_path(file_path, kind)
+        if not path.exists():
+            return False
+        try:
+            with pa.memory_map(str(path)) as source:
+                metadata = pa.ipc.open_file(source).schema.metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            return False
+        expected = self._source_metadata(file_path, tag)
+        return all(metadata.get(key) == value for key, value in expected.items())
+
+    def _open(self, file_path: Path, kind: str):
+        return pa.ipc.open_file(pa.memory_map(str(self.cache_path(file_path, kind))))
+
+    def read(self, file_path: Path, kind: str = "normalized") -> pd.DataFrame:
+        """Reads a cached file through a memory map."""
+        return self._open(file_path, kind).read_all().to_pandas()
+
+    def read_metadata(self, file_path: Path, kind: str = "normalized") -> Dict[str, str]:
+        """The metadata of a cached file, including the ``extra`` entries it was written with."""
+        metadata = self._open(file_path, kind).schema.metadata or {}
+        return {key.decode(): value.decode() for key, value in metadata.items()}
+
+    def iter_chunks(self, file_path: Path, kind: str = "normalized") -> Iterator[pd.DataFrame]:
+        """Yields the cached record batches (one per chunk written) as DataFrames."""
+        reader = self._open(file_path, kind)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i).to_pandas()
+
+    @staticmethod
+    def normalize_types(df: pd.DataFrame) -> pd.DataFrame:
+        """Gives every chunk of a file the same Arrow schema.
+
+        Categorical, string and numeric columns keep their dtype; anything
+        else (e.g. mixed object columns of untyped fallback chunks) is stored
+        as strings.
+        """
+        columns = {}
+        for col in df.columns:
+            dtype = df[col].dtype
+            if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype) or (pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)):
+                columns[col] = df[col]
+            else:
+                columns[col] = df[col].astype("string")
+        return pd.DataFrame(columns, index=df.index, copy=False)
+
+    @staticmethod
+    def _extend_categories(df: pd.DataFrame, categories: Dict[str, pd.Index]) -> pd.DataFrame:
+        """Recodes categorical columns onto the categories of the earlier chunks plus their new values.
+
+        Each chunk's dictionary then extends the previous one, which the IPC
+        file format can store as a delta instead of a replacement.
+        """
+        columns = {}
+        for col in df.columns:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                known = categories.get(col)
+                if known is None:
+                    known = series.cat.categories
+                else:
+                    new = series.cat.categories.difference(known, sort=False)
+                    known = known.append(new) if len(new) else known
+                    if not known.equals(series.cat.categories):
+                        series = series.cat.set_categories(known)
+                categories[col] = known
+            columns[col] = series
+        return pd.DataFrame(columns, index=df.index, copy=False)
+
+    @staticmethod
+    def _wide_dictionaries(schema: "pa.Schema") -> "pa.Schema":
+        """Widens dictionary indices to int32, so a file's categories can outgrow what its first chunk needed."""
+        for i, field in enumerate(schema):
+            if pa.types.is_dictionary(field.type):
+                schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type)))
+        return schema
+
+    @contextmanager
+    def writer(self, file_path: Path, kind: str = "normalized", tag: str = "", extra: Optional[Dict[str, str]] = None):
+        """Appends chunks to a new cache file that only replaces the old one once complete.
+
+        Args:
+            file_path (Path): Source CSV of the cached month.
+            kind (str): Cache stage, one of ``kinds``.
+            tag (str): Recorded and compared by ``is_fresh``.
+            extra (Dict[str, str], optional): More metadata to store, returned by ``read_metadata``.
+
+        Yields:
+            Callable[[pd.DataFrame], None]: Function that writes one chunk.
+        """
+        path = self.cache_path(file_path, kind)
+        tmp_path = path.with_suffix(".feather.tmp")
+        metadata = {**{key.encode(): value.encode() for key, value in (extra or {}).items()}, **self._source_metadata(file_path, tag)}
+        state = {"writer": None, "schema": None, "skipped": False, "categories": {}}
+
+        def write(df: pd.DataFrame) -> None:
+            if state["skipped"]:
+                return
+            table = pa.Table.from_pandas(self._extend_categories(df, state["categories"]), preserve_index=False)
+            if state["writer"] is None:
+                schema = self._wide_dictionaries(table.schema)
+                state["schema"] = schema.with_metadata({**(schema.metadata or {}), **metadata})
+                options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+                state["writer"] = pa.ipc.new_file(str(tmp_path), state["schema"], options=options)
+            try:
+                state["writer"].write_table(table.cast(state["schema"]))
+            except (ValueError, pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                # e.g. chunks read untyped after a dtype fallback; the file is just not cached this time.
+                logging.warning(f"Not caching {file_path.name}: chunk schema differs from the first chunk ({e})")
+                state["skipped"] = True
+
+        try:
+            yield write
+            if state["writer"] is not None:
+                state["writer"].close()
+                if not state["skipped"]:
+                    os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                if state["writer"] is not None:
+                    state["writer"].close()
+                tmp_path.unlink()
+
+    def write(self, file_path: Path, df: pd.DataFrame, kind: str = "normalized", tag: str = "", extra: Optional[Dict[str, str]] = None) -> None:
+        with self.writer(file_path, kind, tag, extra) as write:
+            write(df)
@@ -2,30 +2,92 @@
 #░█▀▀░▄▀▄░░█░░█▀▄░█▀█░█░░░░█░░░█░░█░█░█░█░░░█░█░█░█░█░█░█░█░█░░░█▀▀
 #░▀▀▀░▀░▀░░▀░░▀░▀░▀░▀░▀▀▀░░▀░░▀▀▀░▀▀▀░▀░▀░░░▀░▀░▀▀▀░▀▀░░▀▀▀░▀▀▀░▀▀▀
 
-from typing import List, Dict, Any
-import os
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+import csv
+import io
+import logging
+from dataclasses import dataclass
 import pandas as pd
+from pandas.api.types import union_categoricals
 from pathlib import Path
 from dotenv import load_dotenv
-from config.settings import COLUMN_MAPPING
+from config.settings import COLUMN_MAPPING, CSV_DTYPES
+from .archive import ARCHIVE_SUFFIX, archive_member, list_archive_csvs, open_source, source_size
+from .cache import ColumnarCache
+from ..metrics import NULL_METRICS, Metrics
 from concurrent.futures import ThreadPoolExecutor
-import time
 
 
 load_dotenv()
 
+
+def concat_chunks(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenates chunks, keeping categorical columns categorical.
+
+    ``pd.concat`` falls back to object dtype when chunks carry different
+    categories, so the categories are unified first.
+    """
+    chunks = [chunk for chunk in chunks if not chunk.empty]
+    if not chunks:
+        return pd.DataFrame()
+    for col in chunks[0].columns:
+        series = [chunk[col] for chunk in chunks if col in chunk.columns]
+        if len(series) == len(chunks) and all(isinstance(s.dtype, pd.CategoricalDtype) for s in series):
+            categories = union_categoricals(series, ignore_order=True).categories
+            for chunk in chunks:
+                chunk[col] = chunk[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def sniff_header(file_path: Path) -> Tuple[str, ...]:
+    """Reads only the header row of a CSV with the csv module, without starting a pandas parser."""
+    with open_source(file_path) as stream:
+        f = io.TextIOWrapper(stream, newline="", encoding="utf-8-sig", errors="replace")
+        return tuple(next(csv.reader(f), []))
+
+
+@dataclass(frozen=True)
+class ReadPlan:
+    """How to read files that share a header: which columns to parse, their canonical names and dtypes.
+
+    Attributes:
+        usecols (Tuple[int, ...]): Positions of the columns that map to a canonical name.
+        names (Tuple[str, ...]): Canonical name of each of those columns, in file order.
+        dtype (Dict[str, str]): ``CSV_DTYPES`` entries for the canonical names.
+    """
+    usecols: Tuple[int, ...]
+    names: Tuple[str, ...]
+    dtype: Dict[str, str]
+
+    def options(self, typed: bool = True) -> Dict[str, Any]:
+        """``read_csv`` options that replace the header with the canonical names."""
+        options: Dict[str, Any] = {"header": 0, "usecols": list(self.usecols), "names": list(self.names)}
+        if typed:
+            options["dtype"] = dict(self.dtype)
+        return options
+
+
 class EcobiciDataExtractor:
     
-    def __init__(self, source: str, subfolder: str = "ecobici_data"):
+    def __init__(self, source: str, subfolder: str = "ecobici_data", cache: Optional[ColumnarCache] = None, typed: bool = True, metrics: Optional[Metrics] = None):
         self.source = source
         self.subfolder = subfolder
+        self.cache = cache
+        self.typed = typed
+        self.metrics = metrics or NULL_METRICS
+        # Read plans per distinct header; the historic files only use a handful of layouts.
+        self.read_plans: Dict[Tuple[str, ...], ReadPlan] = {}
+
+    @property
+    def folder(self) -> Path:
+        return Path(self.source) / self.subfolder
 
     def list_csv_files(self) -> List[Path]:
 
         if not self.source:
             raise ValueError("The environment variable BASE_PATH is not defined.")
         
-        folder = Path(self.source) / self.subfolder
+        folder = self.folder
         if not folder.exists():
             raise FileNotFoundError(f"The folder {folder} does not exist.")
         
@@ -34,35 +96,141 @@ class EcobiciDataExtractor:
         for year_dir in year_dirs:
             file_paths.extend([file for file in year_dir.glob("*.csv")])
 
+        # Months only available in a yearly archive (<year>.zip) are read from inside it; loose CSVs win.
+        months = {file.stem for file in file_paths}
+        for archive in sorted(folder.glob(f"*{ARCHIVE_SUFFIX}")):
+            members = [member for member in list_archive_csvs(archive) if member.stem not in months]
+            months.update(member.stem for member in members)
+            file_paths.extend(members)
+
         return file_paths
 
+    @staticmethod
+    def normalize_column(col: str) -> str:
+        return col.strip().replace(" ", "_").lower()
+
+    def read_plan(self, header: Iterable[str]) -> ReadPlan:
+        """Resolves a header to canonical columns once per distinct header.
+
+        Columns that do not map through ``COLUMN_MAPPING`` (e.g. ``Unnamed: 9``)
+        are left out, and when several columns map to the same canonical name
+        only the first is kept, as ``standardize_columns`` does.
+        """
+        signature = tuple(header)
+        plan = self.read_plans.get(signature)
+        if plan is None:
+            usecols, names, dtype = [], [], {}
+            for position, col in enumerate(signature):
+                canonical = COLUMN_MAPPING.get(self.normalize_column(col))
+                if canonical is None or canonical in names:
+                    continue
+                usecols.append(position)
+                names.append(canonical)
+                if canonical in CSV_DTYPES:
+                    dtype[canonical] = CSV_DTYPES[canonical]
+            plan = self.read_plans[signature] = ReadPlan(tuple(usecols), tuple(names), dtype)
+        return plan
+
+    def read_options(self, file_path: Path, typed: Optional[bool] = None) -> Dict[str, Any]:
+        """Builds the ``read_csv`` options of a file from its sniffed header.
+
+        Only columns that map to a canonical name are parsed, they come out
+        with their canonical names, and (when typed) they are parsed straight
+        into the types declared in ``CSV_DTYPES``.
+        """
+        return self.read_plan(sniff_header(file_path)).options(self.typed if typed is None else typed)
+
     def standardize_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        df.columns = [col.strip().replace(" ", "_").lower() for col in df.columns]
+        df.columns = [self.normalize_column(col) for col in df.columns]
         df = df.rename(columns=COLUMN_MAPPING)
         df = df.loc[:, ~df.columns.str.contains('^unnamed', case=False)]
         df = df.loc[:, ~df.columns.duplicated()]
         return df
 
-    def read_file_pandas(self, file_path: Path) -> pd.DataFrame:
-        if file_path.suffix == ".csv":
-            chunks = pd.read_csv(file_path, chunksize=100_000, low_memory=False)
-            df = pd.concat((self.standardize_columns(chunk) for chunk in chunks), ignore_index=True)
-        else:
+    def iter_stream_chunks(self, stream, source_month: str, chunksize: int = 100_000, **read_options) -> Iterator[pd.DataFrame]:
+        """Parses CSV from a path or binary file-like object (e.g. an HTTP response body) chunk by chunk.
+
+        Chunks are standardized one by one unless ``read_options`` come from a
+        ``ReadPlan``, in which case they are already canonical.
+        """
+        planned = "names" in read_options
+        with pd.read_csv(stream, chunksize=chunksize, low_memory=False, **read_options) as chunks:
+            for chunk in self.metrics.timed(chunks, "extract_chunk", month=source_month):
+                if not planned:
+                    chunk = self.standardize_columns(chunk)
+                chunk["source_month"] = source_month
+                self.metrics.inc("extract_rows_total", len(chunk), month=source_month)
+                yield chunk
+
+    def read_csv_chunks(self, file_path: Path, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        if file_path.suffix != ".csv":
             raise ValueError(f"Unsupported format: {file_path.suffix}")
+        # Files are named after their normalized month (YYYY-MM), which tags every trip for month-level reloads.
+        self.metrics.inc("extract_bytes_total", source_size(file_path), month=file_path.stem)
+        options = self.read_options(file_path)
+        if not self.typed:
+            with open_source(file_path) as stream:
+                yield from self.iter_stream_chunks(stream, file_path.stem, chunksize, **options)
+            return
+        rows = 0
+        try:
+            with open_source(file_path) as stream:
+                for chunk in self.iter_stream_chunks(stream, file_path.stem, chunksize, **options):
+                    rows += len(chunk)
+                    yield chunk
+        except (ValueError, TypeError) as e:
+            # A value that does not fit the declared dtype: read the rest of the file untyped.
+            logging.warning(f"Lectura sin tipos de {file_path.name} desde la fila {rows}: {e}")
+            self.metrics.inc("extract_untyped_fallbacks_total", month=file_path.stem)
+            self.metrics.event("extract_untyped_fallback", file=str(file_path), row=rows, error=f"{type(e).__name__}: {e}")
+            with open_source(file_path) as stream:
+                yield from self.iter_stream_chunks(stream, file_path.stem, chunksize, skiprows=range(1, rows + 1), **self.read_options(file_path, typed=False))
+
+    def iter_file_chunks(self, file_path: Path, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        # Archive members have no folder of their own to hold cache files, so they are always parsed.
+        if self.cache is None or archive_member(file_path) is not None:
+            yield from self.read_csv_chunks(file_path, chunksize)
+        elif self.cache.is_fresh(file_path):
+            self.metrics.inc("extract_cache_hits_total", month=file_path.stem)
+            yield from self.metrics.timed(self.cache.iter_chunks(file_path), "extract_cached_chunk", month=file_path.stem)
+        else:
+            with self.cache.writer(file_path) as write:
+                for chunk in self.read_csv_chunks(file_path, chunksize):
+                    chunk = self.cache.normalize_types(chunk)
+                    write(chunk)
+                    yield chunk
+
+    def read_file_pandas(self, file_path: Path) -> pd.DataFrame:
+        with self.metrics.span("extract_file", month=file_path.stem) as span:
+            df = concat_chunks(self.iter_file_chunks(file_path))
+            span["rows"] = len(df)
         return df
-    
+
+    def read_error(self, file_path: Path, error: Exception) -> None:
+        """Logs and counts a file that could not be read, so skipped files show up in the metrics."""
+        logging.error(f"Error al leer {file_path.name}: {error}", exc_info=error)
+        self.metrics.inc("extract_errors_total", month=file_path.stem)
+        self.metrics.event("extract_error", file=str(file_path), error=f"{type(error).__name__}: {error}")
+
     def safe_read_file(self, file_path: Path):
         try:
             return self.read_file_pandas(file_path)
         except Exception as e:
-            print(f"Error al leer {file_path.name}: {e}")
+            self.read_error(file_path, e)
             return pd.DataFrame()
 
+    def iter_chunks(self, file_paths: Iterable[Path], chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        """Yields standardized chunks file by file without concatenating them."""
+        for file_path in file_paths:
+            try:
+                yield from self.iter_file_chunks(file_path, chunksize=chunksize)
+            except Exception as e:
+                self.read_error(file_path, e)
+
     def read_files_in_parallel_pandas(self, file_paths, max_workers=4) -> pd.DataFrame:
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             results = list(executor.map(self.safe_read_file, file_paths))
-        results = [df for df in results if not df.empty]
-        return pd.concat(results, ignore_index=True)
+        return concat_chunks(results)
 
 
 # def main():
@@ -0,0 +1,5 @@
+from .load import *
+from .rollups import *
+from .partitions import *
+from .stations import load_stations
+from .encoder import encode_frame
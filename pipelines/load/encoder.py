@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+from bson.raw_bson import RawBSONDocument
+
+# BSON element type bytes.
+BSON_DOUBLE = 0x01
+BSON_STRING = 0x02
+BSON_OBJECT_ID = 0x07
+BSON_BOOL = 0x08
+BSON_DATETIME = 0x09
+BSON_NULL = 0x0A
+BSON_INT32 = 0x10
+BSON_INT64 = 0x12
+
+INT32_MIN, INT32_MAX = -2**31, 2**31 - 1
+
+
+class _ObjectIds:
+    """Generates ObjectIds in bulk: 4-byte timestamp, 5 random bytes per process and a 3-byte counter."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def generate(self, count: int) -> np.ndarray:
+        with self.lock:
+            if self.pid != os.getpid():
+                # Forked workers must not reuse the parent's random bytes and counter.
+                self.pid = os.getpid()
+                self.random = np.frombuffer(os.urandom(5), dtype=np.uint8)
+                self.counter = int.from_bytes(os.urandom(3), "big")
+            start = self.counter
+            self.counter = (self.counter + count) % 0x1000000
+        ids = np.empty((count, 12), dtype=np.uint8)
+        ids[:, :4] = np.frombuffer(int(time.time()).to_bytes(4, "big"), dtype=np.uint8)
+        ids[:, 4:9] = self.random
+        counters = (start + np.arange(count, dtype=np.int64)) % 0x1000000
+        ids[:, 9] = counters >> 16
+        ids[:, 10] = (counters >> 8) & 0xFF
+        ids[:, 11] = counters & 0xFF
+        return ids
+
+
+_object_ids = _ObjectIds()
+
+
+class _Column:
+    """One DataFrame column prepared for encoding.
+
+    Attributes:
+        key (bytes): Field name as a BSON cstring.
+        kind (int): BSON type of the non-null values.
+        values (np.ndarray): Values as fixed-width numbers, or codes into ``strings``.
+        nulls (np.ndarray): Boolean mask of missing values.
+        strings (List[bytes]): Distinct UTF-8 values of a string column.
+    """
+
+    def __init__(self, name: str, series: pd.Series):
+        self.key = name.encode("utf-8") + b"\x00"
+        if b"\x00" in self.key[:-1] or name.startswith("$"):
+            raise TypeError(f"Column name {name!r} is not a valid BSON key.")
+        self.strings: List[bytes] = []
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype) or dtype == object:
+            self._strings(series)
+        elif pd.api.types.is_bool_dtype(dtype):
+            self.nulls = series.isna().to_numpy()
+            self.kind = BSON_BOOL
+            self.values = series.fillna(False).to_numpy(dtype=np.uint8)
+        elif pd.api.types.is_integer_dtype(dtype):
+            self.nulls = series.isna().to_numpy()
+            values = series.to_numpy(dtype=np.int64, na_value=0)
+            valid = values[~self.nulls]
+            # Same choice as PyMongo makes per value: int32 when the numbers fit.
+            fits = not len(valid) or (valid.min() >= INT32_MIN and valid.max() <= INT32_MAX)
+            self.kind = BSON_INT32 if fits else BSON_INT64
+            self.values = values.astype("<i4" if fits else "<i8")
+        elif pd.api.types.is_float_dtype(dtype):
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            self.nulls = np.isnan(values)
+            self.kind = BSON_DOUBLE
+            self.values = values.astype("<f8")
+        elif pd.api.types.is_datetime64_dtype(dtype):
+            self.nulls = series.isna().to_numpy()
+            self.kind = BSON_DATETIME
+            # BSON datetimes are milliseconds since the epoch; naive values are taken as UTC, as PyMongo does.
+            self.values = series.to_numpy(dtype="datetime64[ms]").astype("<i8")
+        else:
+            raise TypeError(f"Column {name!r} has an unsupported dtype: {dtype}.")
+
+    def _strings(self, series: pd.Series) -> None:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        if not all(isinstance(value, str) for value in uniques):
+            raise TypeError(f"Column {series.name!r} holds values other than strings.")
+        self.kind = BSON_STRING
+        self.nulls = codes < 0
+        self.values = codes
+        self.strings = [value.encode("utf-8") for value in uniques]
+
+    @property
+    def pattern(self) -> np.ndarray:
+        """Per row: -1 when null, otherwise the UTF-8 length for strings or 0 for fixed-width values."""
+        if self.kind == BSON_STRING:
+            lengths = np.array([len(value) for value in self.strings] + [-1], dtype=np.int64)
+            return lengths[self.values]
+        return np.where(self.nulls, -1, 0)
+
+
+def _group_rows(patterns: np.ndarray) -> List[np.ndarray]:
+    """Row positions of each distinct pattern row, in row order within a group."""
+    # Fold the columns into one integer key, compacting it whenever the next column could overflow it.
+    key = np.zeros(len(patterns), dtype=np.int64)
+    radix = 1
+    for pattern in patterns.T:
+        width = int(pattern.max()) + 2
+        if radix * width >= 2**62:
+            key, uniques = pd.factorize(key)
+            radix = len(uniques)
+        key = key * width + (pattern + 1)
+        radix *= width
+    codes, uniques = pd.factorize(key)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes, minlength=len(uniques)))[:-1]
+    return np.split(order, bounds)
+
+
+def _layout(columns: List[_Column], pattern: np.ndarray) -> Tuple[np.dtype, List[Tuple[int, _Column, int]]]:
+    """Structured dtype of the documents whose nulls and string lengths follow ``pattern``."""
+    fields = [("size", "<i4"), ("id_type", "u1"), ("id_key", "S4"), ("id", "u1", (12,))]
+    elements = []
+    for i, (column, length) in enumerate(zip(columns, pattern)):
+        fields += [(f"t{i}", "u1"), (f"k{i}", f"S{len(column.key)}")]
+        if length < 0:
+            elements.append((i, column, -1))
+            continue
+        if column.kind == BSON_STRING:
+            fields += [(f"n{i}", "<i4"), (f"v{i}", f"S{length + 1}")]
+        else:
+            fields.append((f"v{i}", column.values.dtype.str))
+        elements.append((i, column, length))
+    fields.append(("end", "u1"))
+    return np.dtype(fields), elements
+
+
+def encode_frame(df: pd.DataFrame) -> List[RawBSONDocument]:
+    """Encodes every row of a DataFrame as a BSON document, column by column.
+
+    Rows are grouped by their layout (which fields are null and how long each
+    string is). All documents of a group have the same size and offsets, so
+    they are written at once into a numpy structured array whose fields are
+    the BSON element headers and values, and the buffer is sliced into
+    documents. Each document gets a generated ``_id``, like ``insert_many``
+    would add. Missing values (NaN, NaT, ``<NA>``) become BSON null, as in
+    ``EcobiciDataLoader.to_documents``.
+
+    Raises:
+        TypeError: If a column has a dtype or values the encoder does not handle.
+    """
+    rows = len(df)
+    if rows == 0:
+        return []
+    columns = [_Column(str(name), df[name]) for name in df.columns]
+    patterns = np.stack([column.pattern for column in columns], axis=1)
+    groups = _group_rows(patterns)
+    ids = _object_ids.generate(rows)
+    documents: List[RawBSONDocument] = [None] * rows
+    for positions in groups:
+        dtype, elements = _layout(columns, patterns[positions[0]])
+        array = np.zeros(len(positions), dtype=dtype)
+        array["size"] = dtype.itemsize
+        array["id_type"] = BSON_OBJECT_ID
+        array["id_key"] = b"_id"
+        array["id"] = ids[positions]
+        for i, column, length in elements:
+            array[f"t{i}"] = BSON_NULL if length < 0 else column.kind
+            array[f"k{i}"] = column.key
+            if length < 0:
+                continue
+            if column.kind == BSON_STRING:
+                array[f"n{i}"] = length + 1
+                # Every row of the group has a string of this length; numpy pads the trailing NUL.
+                array[f"v{i}"] = np.array(column.strings, dtype=object)[column.values[positions]].astype(f"S{length + 1}")
+            else:
+                array[f"v{i}"] = column.values[positions]
+        buffer = array.tobytes()
+        size = dtype.itemsize
+        for j, position in enumerate(positions):
+            documents[position] = RawBSONDocument(buffer[j * size:(j + 1) * size])
+    return documents
+
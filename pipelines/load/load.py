@@ -0,0 +1,334 @@
+import logging
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+from pymongo import IndexModel, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from config.settings import TRIP_KEY_INDEX, TRIP_LAYOUTS, TRIP_TIMESERIES
+from ..metrics import NULL_METRICS, Metrics
+from ..transform.dedup import TripDeduplicator
+from .encoder import encode_frame
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Returns the peak resident set size of the current process in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@dataclass
+class LoadStats:
+    """Summary of a load run.
+
+    Attributes:
+        documents (int): Documents inserted.
+        batches (int): Bulk writes sent to MongoDB.
+        errors (int): Documents rejected by the server.
+        skipped (int): Trips already loaded, dropped by the deduplicator or
+            rejected by the unique ``trip_key`` index.
+        elapsed (float): Wall time of the run in seconds.
+        peak_rss_mb (float): Peak resident memory of the process in MB.
+    """
+    documents: int = 0
+    batches: int = 0
+    errors: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    peak_rss_mb: Optional[float] = field(default=None)
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        rss = f"{self.peak_rss_mb:.1f} MB" if self.peak_rss_mb is not None else "n/a"
+        return (
+            f"{self.documents} docs in {self.batches} batches "
+            f"({self.errors} errors, {self.skipped} skipped) in {self.elapsed:.2f}s - "
+            f"{self.docs_per_sec:,.0f} docs/sec, peak RSS {rss}"
+        )
+
+
+class EcobiciDataLoader:
+    """Writes transformed ECOBICI chunks into a MongoDB collection.
+
+    Chunks are split into batches of ``batch_size`` rows and written with
+    unordered ``insert_many`` calls. At most ``max_in_flight`` batches are
+    converted to documents and sent at the same time, so memory is bounded
+    by the batch size rather than by the size of the dataset.
+
+    ``layout`` selects how trips are stored (see ``TRIP_LAYOUTS``): one
+    document per trip, a time-series collection whose metaField holds the
+    start station, or one bucket document per station and hour that trips
+    are pushed into with upserts.
+
+    ``encoding`` selects how flat trips become BSON: ``"raw"`` encodes the
+    batch column by column into ``RawBSONDocument`` objects (see
+    ``encode_frame``), ``"dict"`` builds one Python dict per trip for PyMongo
+    to encode. The other layouts always use dicts.
+
+    With a ``deduplicator``, trips already loaded are dropped before they are
+    written and the flat layout gets a unique ``trip_key`` index; duplicate
+    key errors then count as skipped trips rather than errors, so reruns are
+    idempotent. Trip keys are only saved for batches written without errors,
+    and not at all after a load with errors, so a failed trip is retried by
+    the next run.
+    """
+
+    # Index that replace_month relies on; never dropped before a load.
+    MONTH_INDEX = "source_month_1"
+    TRIP_KEY_INDEX = "trip_key_1"
+    DUPLICATE_KEY = 11000
+    # Fields that identify a bucket in the "bucket" layout; not repeated in the embedded trips.
+    BUCKET_KEYS = ("source_month", "start_station_id", "start_date")
+    ENCODINGS = ("raw", "dict")
+
+    def __init__(self, collection: Collection, batch_size: int = 10_000, max_in_flight: int = 4, index_specs: Optional[List[Dict]] = None, layout: str = "flat", timeseries: Optional[Dict] = None, metrics: Optional[Metrics] = None, encoding: str = "raw", deduplicator: Optional[TripDeduplicator] = None):
+        if batch_size < 1 or max_in_flight < 1:
+            raise ValueError("batch_size and max_in_flight must be positive.")
+        if layout not in TRIP_LAYOUTS:
+            raise ValueError(f"Unsupported layout: {layout}. Use one of {TRIP_LAYOUTS}.")
+        if encoding not in self.ENCODINGS:
+            raise ValueError(f"Unsupported encoding: {encoding}. Use one of {self.ENCODINGS}.")
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.index_specs = index_specs or []
+        self.layout = layout
+        self.timeseries = timeseries or TRIP_TIMESERIES
+        self.metrics = metrics or NULL_METRICS
+        self.encoding = encoding
+        self.deduplicator = deduplicator
+
+    @staticmethod
+    def to_documents(df: pd.DataFrame) -> List[dict]:
+        """Converts a DataFrame into BSON-encodable documents (NA values become None)."""
+        return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+    @staticmethod
+    def to_values(series: pd.Series) -> list:
+        return series.astype(object).where(series.notna(), None).tolist()
+
+    def to_raw_documents(self, df: pd.DataFrame) -> list:
+        """Encodes a batch straight to BSON, falling back to dicts for dtypes the encoder does not handle."""
+        try:
+            return encode_frame(df)
+        except TypeError as e:
+            logging.warning(f"Falling back to dict encoding: {e}")
+            self.metrics.inc("load_encoding_fallbacks_total", collection=self.collection.name)
+            return self.to_documents(df)
+
+    def to_timeseries_documents(self, df: pd.DataFrame) -> List[dict]:
+        """Converts trips into time-series measurements with the start station as metadata."""
+        documents = self.to_documents(df.drop(columns=["start_station_id"]))
+        meta_field = self.timeseries["metaField"]
+        for document, station in zip(documents, self.to_values(df["start_station_id"])):
+            document[meta_field] = {"start_station_id": station}
+        return documents
+
+    def to_bucket_updates(self, df: pd.DataFrame) -> List[Tuple[UpdateOne, int]]:
+        """Groups trips by station and start hour into upserts that append them to their bucket.
+
+        Returns:
+            List[Tuple[UpdateOne, int]]: One upsert per bucket and the number of trips it carries.
+        """
+        keys = {key: self.to_values(df[key]) for key in self.BUCKET_KEYS}
+        keys["hour"] = self.to_values(df["start_time"] // 60)
+        trips = self.to_documents(df.drop(columns=list(self.BUCKET_KEYS)))
+        buckets: Dict[tuple, List[dict]] = {}
+        for i, key in enumerate(zip(*keys.values())):
+            buckets.setdefault(key, []).append(trips[i])
+        updates = []
+        for key, bucket in buckets.items():
+            bucket_id = dict(zip(keys, key))
+            starts = [trip["start_timestamp"] for trip in bucket if trip.get("start_timestamp") is not None]
+            update = {
+                "$setOnInsert": bucket_id,
+                "$push": {"trips": {"$each": bucket}},
+                "$inc": {"count": len(bucket)},
+            }
+            if starts:
+                update["$min"] = {"first_start": min(starts)}
+                update["$max"] = {"last_start": max(starts)}
+            updates.append((UpdateOne({"_id": bucket_id}, update, upsert=True), len(bucket)))
+        return updates
+
+    def iter_batches(self, df: pd.DataFrame) -> Iterator[pd.DataFrame]:
+        for start in range(0, len(df), self.batch_size):
+            yield df.iloc[start:start + self.batch_size]
+
+    def insert_batch(self, batch: pd.DataFrame) -> Tuple[int, int, int]:
+        """Inserts one batch and returns the number of inserted, failed and duplicate documents."""
+        start = time.perf_counter()
+        inserted, errors, duplicates = self._write_batch(batch)
+        labels = {"collection": self.collection.name, "layout": self.layout}
+        self.metrics.observe("load_batch", time.perf_counter() - start, **labels)
+        self.metrics.inc("load_documents_total", inserted, **labels)
+        if errors:
+            self.metrics.inc("load_errors_total", errors, **labels)
+        return inserted, errors, duplicates
+
+    def _write_batch(self, batch: pd.DataFrame) -> Tuple[int, int, int]:
+        if self.layout == "bucket":
+            return self.upsert_buckets(batch)
+        if self.layout == "timeseries":
+            documents = self.to_timeseries_documents(batch)
+        elif self.encoding == "raw":
+            documents = self.to_raw_documents(batch)
+        else:
+            documents = self.to_documents(batch)
+        try:
+            self.collection.insert_many(documents, ordered=False)
+            # PyMongo leaves inserted_ids empty for RawBSONDocuments, so count what was sent.
+            return len(documents), 0, 0
+        except BulkWriteError as e:
+            details = e.details
+            errors = details.get("writeErrors", [])
+            duplicates = sum(error.get("code") == self.DUPLICATE_KEY for error in errors)
+            if duplicates:
+                self.metrics.inc("load_duplicates_total", duplicates, collection=self.collection.name)
+            return details.get("nInserted", 0), len(errors) - duplicates, duplicates
+        except PyMongoError as e:
+            logging.error(f"Error inserting batch of {len(documents)} documents: {e}")
+            return 0, len(documents), 0
+
+    def upsert_buckets(self, batch: pd.DataFrame) -> Tuple[int, int, int]:
+        """Appends one batch to its station-hour buckets and returns the number of stored, failed and duplicate (always 0) trips."""
+        updates = self.to_bucket_updates(batch)
+        try:
+            self.collection.bulk_write([update for update, _ in updates], ordered=False)
+            return len(batch), 0, 0
+        except BulkWriteError as e:
+            failed = sum(updates[error["index"]][1] for error in e.details.get("writeErrors", []))
+            return len(batch) - failed, failed, 0
+        except PyMongoError as e:
+            logging.error(f"Error upserting {len(updates)} buckets: {e}")
+            return 0, len(batch), 0
+
+    def ensure_collection(self) -> None:
+        """Creates the trips collection as a time-series collection when that layout is selected.
+
+        Time-series collections must be created explicitly (MongoDB 5.0+); the
+        other layouts use a plain collection created on first insert. With
+        deduplication, the unique ``trip_key`` index of the flat layout is built
+        here so it guards the load itself.
+        """
+        if self.deduplicator is not None and self.layout == "flat":
+            self.collection.create_index(TRIP_KEY_INDEX["keys"], **{k: v for k, v in TRIP_KEY_INDEX.items() if k != "keys"})
+        if self.layout != "timeseries":
+            return
+        database = self.collection.database
+        if self.collection.name not in database.list_collection_names():
+            database.create_collection(self.collection.name, timeseries=self.timeseries)
+
+    def ensure_month_index(self) -> None:
+        self.collection.create_index([("source_month", 1)])
+
+    def drop_indexes(self) -> List[str]:
+        """Drops secondary indexes so bulk inserts do not maintain them row by row.
+
+        Returns:
+            List[str]: Names of the dropped indexes.
+        """
+        dropped = []
+        for name in self.collection.index_information():
+            if name not in ("_id_", self.MONTH_INDEX, self.TRIP_KEY_INDEX):
+                self.collection.drop_index(name)
+                dropped.append(name)
+        return dropped
+
+    def create_indexes(self) -> List[str]:
+        """Builds the declared indexes, typically once a bulk load has finished."""
+        if not self.index_specs:
+            return []
+        models = [IndexModel(spec["keys"], **{k: v for k, v in spec.items() if k != "keys"}) for spec in self.index_specs]
+        return self.collection.create_indexes(models)
+
+    def replace_month(self, month: str) -> int:
+        """Deletes the trips previously loaded from a month so it can be reloaded idempotently.
+
+        On a time-series collection, deleting by a measurement field such as
+        ``source_month`` needs MongoDB 7.0+.
+
+        Returns:
+            int: Number of deleted documents.
+        """
+        return self.collection.delete_many({"source_month": month}).deleted_count
+
+    def load_month(self, month: str, chunks: Iterable[pd.DataFrame]) -> Tuple[int, LoadStats]:
+        """Replaces the trips of a month with the given chunks.
+
+        Returns:
+            Tuple[int, LoadStats]: Documents deleted first and the load summary.
+        """
+        deleted = self.replace_month(month)
+        if self.deduplicator is not None:
+            self.deduplicator.reset_month(month)
+        return deleted, self.load(chunks)
+
+    def _collect(self, futures: Iterable[Future], stats: LoadStats, batches: Dict[Future, pd.DataFrame]) -> None:
+        for future in futures:
+            batch = batches.pop(future)
+            try:
+                inserted, errors, duplicates = future.result()
+            except Exception as e:
+                # e.g. InvalidDocument while encoding; the rest of the load goes on.
+                logging.error(f"Error writing batch of {len(batch)} documents: {e}")
+                self.metrics.inc("load_errors_total", len(batch), collection=self.collection.name, layout=self.layout)
+                inserted, errors, duplicates = 0, len(batch), 0
+            if self.deduplicator is not None and not errors:
+                self.deduplicator.confirm(batch)
+            stats.documents += inserted
+            stats.errors += errors
+            stats.skipped += duplicates
+            stats.batches += 1
+
+    def load(self, chunks: Iterable[pd.DataFrame]) -> LoadStats:
+        """Loads every chunk from an iterable of DataFrames.
+
+        Args:
+            chunks (Iterable[pd.DataFrame]): Transformed chunks, consumed lazily.
+
+        Returns:
+            LoadStats: Throughput and memory summary of the run.
+        """
+        stats = LoadStats()
+        start_time = time.perf_counter()
+        pending: Set[Future] = set()
+        batches: Dict[Future, pd.DataFrame] = {}
+        if self.deduplicator is not None:
+            dropped = self.deduplicator.dropped
+            chunks = self.deduplicator.dedupe_chunks(chunks)
+        with self.metrics.span("load", collection=self.collection.name), ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            for chunk in chunks:
+                for batch in self.iter_batches(chunk):
+                    if len(pending) >= self.max_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        self._collect(done, stats, batches)
+                    future = executor.submit(self.insert_batch, batch)
+                    batches[future] = batch
+                    pending.add(future)
+                    self.metrics.set_gauge("load_batches_in_flight", len(pending), collection=self.collection.name)
+            self._collect(wait(pending).done, stats, batches)
+        if self.deduplicator is not None:
+            stats.skipped += self.deduplicator.dropped - dropped
+            # Keys confirmed before an error stay in memory and are saved by the next clean load.
+            if not stats.errors:
+                self.deduplicator.save()
+        stats.elapsed = time.perf_counter() - start_time
+        stats.peak_rss_mb = peak_rss_mb()
+        return stats
@@ -0,0 +1,79 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from pymongo.database import Database
+
+from config.partitions import partition_months, partition_name
+from .load import EcobiciDataLoader, LoadStats
+
+
+class PartitionedLoader:
+    """Loads each month into its own collection and swaps it in atomically.
+
+    A month is written to a staging collection, indexed, and then renamed
+    over its partition with ``dropTarget``. Readers see either the old or the
+    new month, never a half-loaded one, and a failed load leaves the previous
+    partition untouched. Reloading a month drops one small collection instead
+    of running ``delete_many`` over every trip.
+
+    Accepts the same options as ``EcobiciDataLoader``; the time-series layout
+    is not supported because time-series collections cannot be renamed.
+    """
+
+    STAGING_SUFFIX = "__staging"
+
+    def __init__(self, database: Database, base_name: str = "trips", **loader_options):
+        if loader_options.get("layout") == "timeseries":
+            raise ValueError("Time-series collections cannot be renamed; use the flat or bucket layout.")
+        self.database = database
+        self.base_name = base_name
+        self.loader_options = loader_options
+
+    def load_month(self, month: str, chunks: Iterable[pd.DataFrame]) -> Tuple[int, LoadStats]:
+        """Loads a month into a staging collection and swaps it in for the month's partition.
+
+        Returns:
+            Tuple[int, LoadStats]: Documents in the replaced partition and the load summary.
+
+        Raises:
+            RuntimeError: If any document failed to load; the partition is left as it was.
+        """
+        name = partition_name(self.base_name, month)
+        staging = self.database[name + self.STAGING_SUFFIX]
+        staging.drop()
+        loader = EcobiciDataLoader(staging, **self.loader_options)
+        if loader.deduplicator is not None:
+            loader.deduplicator.reset_month(month)
+        loader.ensure_collection()
+        try:
+            stats = loader.load(chunks)
+            if stats.errors:
+                raise RuntimeError(f"{stats.errors} documents failed to load into {staging.name}; {name} was not replaced.")
+            loader.create_indexes()
+        except Exception:
+            staging.drop()
+            if loader.deduplicator is not None:
+                # The month's keys were never saved; forget them along with the reset of the month.
+                loader.deduplicator.rollback()
+            raise
+        replaced = self.database[name].estimated_document_count()
+        staging.rename(name, dropTarget=True)
+        return replaced, stats
+
+    # Partitions are indexed as they are swapped in, so there is nothing to do before or after a run.
+    def ensure_month_index(self) -> None:
+        pass
+
+    def create_indexes(self) -> List[str]:
+        return []
+
+    def partitions(self) -> Dict[str, str]:
+        """Months with a partition, mapped to their collection names."""
+        return partition_months(self.database.list_collection_names(), self.base_name)
+
+    def drop_month(self, month: str) -> Optional[str]:
+        name = partition_name(self.base_name, month)
+        if name not in self.database.list_collection_names():
+            return None
+        self.database.drop_collection(name)
+        return name
@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+DURATION_MINUTES = {"$divide": [{"$subtract": ["$end_timestamp", "$start_timestamp"]}, 60_000]}
+
+
+@dataclass
+class Rollup:
+    """A materialized aggregate of the trips collection, maintained per source month.
+
+    Attributes:
+        name (str): Target collection.
+        keys (Dict[str, object]): Group fields and the expression that computes each one.
+        metrics (Dict[str, dict]): ``$group`` accumulators.
+    """
+    name: str
+    keys: Dict[str, object]
+    metrics: Dict[str, dict]
+
+    @property
+    def key_fields(self) -> List[str]:
+        return ["source_month", *self.keys]
+
+    def pipeline(self, month: str) -> List[dict]:
+        """Aggregates one month of trips and merges the result into the rollup collection.
+
+        The group key doubles as ``_id``, so ``$merge`` matches on the always
+        unique ``_id`` even when a key such as ``age`` is null. The key fields
+        are also copied to the top level for querying.
+        """
+        group_id = {"source_month": "$source_month", **self.keys}
+        return [
+            {"$match": {"source_month": month}},
+            {"$group": {"_id": group_id, **self.metrics}},
+            {"$addFields": {field: f"$_id.{field}" for field in self.key_fields}},
+            {"$merge": {
+                "into": self.name,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }},
+        ]
+
+
+# Trips leaving each station per date and hour of day.
+STATION_HOURLY = Rollup(
+    name="station_hourly",
+    keys={
+        "station_id": "$start_station_id",
+        "date": "$start_date",
+        "hour": {"$floor": {"$divide": ["$start_time", 60]}},
+    },
+    metrics={
+        "trips": {"$sum": 1},
+        "avg_duration_min": {"$avg": DURATION_MINUTES},
+    },
+)
+
+# Origin-destination matrix per day.
+OD_DAILY = Rollup(
+    name="od_daily",
+    keys={
+        "date": "$start_date",
+        "start_station_id": "$start_station_id",
+        "end_station_id": "$end_station_id",
+    },
+    metrics={
+        "trips": {"$sum": 1},
+        "avg_duration_min": {"$avg": DURATION_MINUTES},
+    },
+)
+
+# Demand by gender and age decade (20 = 20-29 years old) per month.
+DEMOGRAPHICS_MONTHLY = Rollup(
+    name="demographics_monthly",
+    keys={
+        "gender": "$gender",
+        "age_group": {"$multiply": [{"$floor": {"$divide": ["$age", 10]}}, 10]},
+    },
+    metrics={
+        "trips": {"$sum": 1},
+        "avg_age": {"$avg": "$age"},
+        "avg_duration_min": {"$avg": DURATION_MINUTES},
+    },
+)
+
+ROLLUPS = [STATION_HOURLY, OD_DAILY, DEMOGRAPHICS_MONTHLY]
+
+
+class RollupManager:
+    """Keeps the rollup collections in sync with the trips collection.
+
+    Rollups are rebuilt one source month at a time, right after that month is
+    (re)loaded: the month's previous rollup documents are deleted and the
+    month's trips are aggregated with ``$merge``. Dashboards then query a few
+    thousand pre-aggregated documents instead of scanning every trip.
+    """
+
+    def __init__(self, trips: Collection, rollups: Optional[List[Rollup]] = None):
+        self.trips = trips
+        self.db: Database = trips.database
+        self.rollups = rollups or ROLLUPS
+
+    def ensure_indexes(self) -> None:
+        """Indexes each rollup by its key fields, which also serves the per-month deletes."""
+        for rollup in self.rollups:
+            self.db[rollup.name].create_indexes([
+                IndexModel([(field, ASCENDING) for field in rollup.key_fields]),
+            ])
+
+    def refresh_month(self, month: str) -> Dict[str, int]:
+        """Rebuilds every rollup for one source month.
+
+        Returns:
+            Dict[str, int]: Rollup name to number of documents for the month.
+        """
+        counts = {}
+        for rollup in self.rollups:
+            target = self.db[rollup.name]
+            target.delete_many({"source_month": month})
+            self.trips.aggregate(rollup.pipeline(month), allowDiskUse=True)
+            counts[rollup.name] = target.count_documents({"source_month": month})
+        return counts
+
+    def refresh(self, months: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, int]]:
+        """Rebuilds the rollups for the given months, or for every month in the trips collection."""
+        self.ensure_indexes()
+        if months is None:
+            months = sorted(self.trips.distinct("source_month"))
+        return {month: self.refresh_month(month) for month in months}
@@ -0,0 +1,21 @@
+from pymongo import GEOSPHERE, ReplaceOne
+from pymongo.database import Database
+
+from ..transform.enrichment import StationCatalog
+
+
+def load_stations(database: Database, catalog: StationCatalog, name: str = "stations") -> int:
+    """Upserts the catalog into a collection with a ``2dsphere`` index on ``location``.
+
+    Stations are keyed by their id, so reloading a newer catalog updates
+    coordinates in place. Nearest-station queries use ``$near`` or
+    ``$geoNear`` on ``location``.
+
+    Returns:
+        int: Stations inserted or updated.
+    """
+    collection = database[name]
+    collection.create_index([("location", GEOSPHERE)])
+    requests = [ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in catalog.to_documents()]
+    result = collection.bulk_write(requests, ordered=False)
+    return result.upserted_count + result.modified_count
@@ -1,30 +1,237 @@
 import os
 from dotenv import load_dotenv
 import time
-from .extract.extraction import EcobiciDataExtractor
+from pymongo import MongoClient
+from .extract.extraction import EcobiciDataExtractor, concat_chunks
+from .extract.cache import ColumnarCache
 from .transform.transformation import EcobiciDataTransformer
+from .transform.dedup import TripDeduplicator, TripKeySet
+from .transform.validation import RULES, CollectionQuarantine, ParquetQuarantine, TripValidator, read_station_ids, station_rule
+from .transform.enrichment import StationCatalog, TripEnricher, distance_matrix
+from .load.stations import load_stations
+from .load.load import EcobiciDataLoader
+from .load.rollups import RollupManager
+from .load.partitions import PartitionedLoader
+from .streaming import bounded
+from .parallel import iter_transformed_files
+from .analytics import analyze_files
+from .manifest import FileManifest
+from .metrics import Metrics
+from ecobici.batch_ecobici import Config, EcobiciDataDownloader
+from config.settings import LAYOUT_INDEXES
 
 load_dotenv()
 
+def run_batch(extractor, transformer, file_paths, max_workers, executor='thread', loader=None, max_files=None):
+    # Batch mode holds every file in memory at once; max_files (BATCH_MAX_FILES) caps it for quick runs.
+    file_paths = file_paths[:max_files]
+    if executor == 'process':
+        transformed_df = concat_chunks(iter_transformed_files(extractor, file_paths, max_workers, executor, transformer.validator, transformer.enricher))
+    else:
+        df = extractor.read_files_in_parallel_pandas(file_paths, max_workers=max_workers)
+        # df.to_csv("ecobici_data.csv", index=False)
+        # print(df.info())
+        transformed_df = transformer.transform_data(df)
+    print(transformed_df.info())
+    print(transformed_df.head(5)) #.transpose())
+    if loader is not None:
+        stats = loader.load([transformed_df])
+        print(f"Load: {stats}")
+
+def run_stream(extractor, transformer, file_paths, queue_size, max_workers, executor='thread', loader=None):
+    if executor == 'process':
+        transformed = iter_transformed_files(extractor, file_paths, max_workers, executor, transformer.validator, transformer.enricher)
+    else:
+        chunks = bounded(extractor.iter_chunks(file_paths), maxsize=queue_size, metrics=extractor.metrics, name='extract')
+        transformed = bounded(transformer.transform_chunks(chunks), maxsize=queue_size, metrics=extractor.metrics, name='transform')
+    if loader is not None:
+        stats = loader.load(transformed)
+        print(f"Load: {stats}")
+    else:
+        rows = sum(len(chunk) for chunk in transformed)
+        print(f"{rows} rows processed.")
+
+def run_analytics(extractor, transformer, file_paths, max_workers, executor='process', output=None):
+    analytics = analyze_files(extractor, file_paths, max_workers, executor, transformer.validator)
+    print(f"{analytics.rows} trips analyzed over {len(analytics.months)} months.")
+    print(f"Top origin-destination pairs:\n{analytics.top_od(10).to_string(index=False)}")
+    hourly = analytics.hourly_frame()
+    print(f"Busiest station hours:\n{hourly.nlargest(10, 'departures').to_string(index=False)}")
+    print(f"Most used bikes:\n{analytics.bike_frame().head(10).to_string(index=False)}")
+    if output:
+        print(f"Analytics written to {[str(path) for path in analytics.write(output)]}")
+
+def run_incremental(extractor, transformer, file_paths, manifest, queue_size, loader, rollups=None):
+    pending = manifest.pending(file_paths) if manifest is not None else file_paths
+    print(f"{len(file_paths) - len(pending)} unchanged files skipped, {len(pending)} to load.")
+    loader.ensure_month_index()
+    for file_path in pending:
+        month = file_path.stem
+        try:
+            chunks = bounded(extractor.iter_file_chunks(file_path), maxsize=queue_size, metrics=extractor.metrics, name='extract')
+            deleted, stats = loader.load_month(month, bounded(transformer.transform_chunks(chunks), maxsize=queue_size, metrics=extractor.metrics, name='transform'))
+        except Exception as e:
+            print(f"Error al cargar {file_path.name}: {e}")
+            continue
+        print(f"{month}: replaced {deleted} docs. Load: {stats}")
+        if rollups is not None:
+            print(f"{month}: rollups {rollups.refresh_month(month)}")
+        if manifest is not None and stats.errors == 0:
+            manifest.record(file_path)
+
+def run_remote(extractor, transformer, queue_size, loader, tee_to_disk=False, rollups=None):
+    config = Config()
+    with EcobiciDataDownloader(config, extractor.metrics) as downloader:
+        files = [f for f in downloader.list_files() if f.year != '0000']
+        print(f"{len(files)} remote files to stream.")
+        loader.ensure_month_index()
+        for file_info in files:
+            month = file_info.normalized_date
+            tee_path = str(extractor.folder / file_info.year / f"{month}.csv") if tee_to_disk else None
+            for attempt in range(1, config.max_retries + 1):
+                try:
+                    with downloader.open_stream(file_info, tee_path=tee_path) as stream:
+                        chunks = bounded(extractor.iter_stream_chunks(stream, month), maxsize=queue_size, metrics=extractor.metrics, name='extract')
+                        deleted, stats = loader.load_month(month, bounded(transformer.transform_chunks(chunks), maxsize=queue_size, metrics=extractor.metrics, name='transform'))
+                    file_info.downloaded = True
+                    print(f"{month}: replaced {deleted} docs. Load: {stats}")
+                    if rollups is not None:
+                        print(f"{month}: rollups {rollups.refresh_month(month)}")
+                    break
+                except Exception as e:
+                    print(f"Error al cargar {file_info.url} (intento {attempt}): {e}")
+                    if attempt < config.max_retries:
+                        time.sleep(config.retry_delay * 2 ** (attempt - 1))
+
 def main():
     source = os.getenv('BASE_PATH')
     max_workers = int(os.getenv('MAX_WORKERS', 4))
-    extractor = EcobiciDataExtractor(source)
-    transformer = EcobiciDataTransformer()
+    mode = os.getenv('PIPELINE_MODE', 'batch')
+    batch_max_files = int(os.getenv('BATCH_MAX_FILES', 0)) or None
+    executor = os.getenv('EXECUTOR', 'thread')
+    incremental = os.getenv('INCREMENTAL', '0') == '1'
+    manifest_path = os.getenv('MANIFEST_PATH')
+    columnar_cache = os.getenv('COLUMNAR_CACHE', '0') == '1'
+    tee_to_disk = os.getenv('TEE_TO_DISK', '0') == '1'
+    queue_size = int(os.getenv('QUEUE_SIZE', 2))
+    mongodb_uri = os.getenv('MONGODB_URI')
+    mongodb_dbname = os.getenv('MONGODB_DBNAME')
+    collection_name = os.getenv('MONGODB_COLLECTION', 'trips')
+    batch_size = int(os.getenv('BATCH_SIZE', 10_000))
+    max_in_flight = int(os.getenv('MAX_IN_FLIGHT', 4))
+    drop_indexes = os.getenv('DROP_INDEXES_BEFORE_LOAD', '0') == '1'
+    build_rollups = os.getenv('ROLLUPS', '0') == '1'
+    layout = os.getenv('TRIP_LAYOUT', 'flat')
+    bson_encoding = os.getenv('BSON_ENCODING', 'raw')
+    deduplicate = os.getenv('DEDUPLICATE', '0') == '1'
+    trip_keys_path = os.getenv('TRIP_KEYS_PATH')
+    validate = os.getenv('VALIDATE', '0') == '1'
+    quarantine = os.getenv('QUARANTINE')
+    stations_path = os.getenv('STATIONS_PATH')
+    enrich = os.getenv('ENRICH', '0') == '1'
+    distance_cache = os.getenv('DISTANCE_MATRIX_CACHE')
+    partitioned = os.getenv('PARTITION_BY_MONTH', '0') == '1'
+    analytics_output = os.getenv('ANALYTICS_OUTPUT')
+    metrics_jsonl = os.getenv('METRICS_JSONL')
+    metrics_prom = os.getenv('METRICS_PROM')
+    metrics_port = os.getenv('METRICS_PORT')
+    profile_stages = [stage for stage in os.getenv('PROFILE_STAGES', '').split(',') if stage]
+    metrics = None
+    if metrics_jsonl or metrics_prom or metrics_port or profile_stages:
+        metrics = Metrics(metrics_jsonl, profile_stages, os.getenv('PROFILER', 'cprofile'), os.getenv('PROFILE_DIR'))
+        if metrics_port:
+            metrics.serve(int(metrics_port))
+    extractor = EcobiciDataExtractor(source, cache=ColumnarCache() if columnar_cache else None, metrics=metrics)
+    client = MongoClient(mongodb_uri) if mongodb_uri and mongodb_dbname else None
+    catalog = None
+    station_ids = None
+    if stations_path:
+        try:
+            catalog = StationCatalog.read(stations_path)
+            station_ids = catalog.ids
+        except ValueError as e:
+            # A list of ids is enough for the validator; enrichment and the stations collection need coordinates.
+            if enrich:
+                raise
+            print(f"{e} Validating station ids only.")
+            station_ids = read_station_ids(stations_path)
+    if enrich and catalog is None:
+        raise ValueError("ENRICH=1 requires STATIONS_PATH.")
+    validator = None
+    if validate:
+        rules = RULES + [station_rule(station_ids)] if station_ids is not None else RULES
+        if quarantine == 'collection':
+            if client is None or executor == 'process':
+                raise ValueError("QUARANTINE=collection requires MONGODB_URI and MONGODB_DBNAME and thread workers.")
+            sink = CollectionQuarantine(client[mongodb_dbname][os.getenv('QUARANTINE_COLLECTION', f'{collection_name}_quarantine')])
+        elif quarantine == 'parquet':
+            sink = ParquetQuarantine(os.getenv('QUARANTINE_PATH') or extractor.folder / "quarantine")
+        else:
+            sink = None
+        validator = TripValidator(rules, sink, metrics)
+    enricher = None
+    if enrich:
+        matrix = distance_matrix(catalog, distance_cache) if distance_cache else None
+        enricher = TripEnricher(catalog, matrix, os.getenv('ENRICH_COORDINATES', '0') == '1', metrics)
+    transformer = EcobiciDataTransformer(metrics, validator, enricher)
     try:
         start_time = time.time()
-        file_paths = extractor.list_csv_files()
+        loader = None
+        rollups = None
+        # Analytics reads the CSVs only; nothing is loaded, so the collections are left alone.
+        if client is not None and mode != 'analytics':
+            deduplicator = TripDeduplicator(TripKeySet(trip_keys_path or extractor.folder / ".trip_keys"), metrics) if deduplicate else None
+            loader_options = dict(batch_size=batch_size, max_in_flight=max_in_flight, index_specs=LAYOUT_INDEXES.get(layout), layout=layout, metrics=metrics, encoding=bson_encoding, deduplicator=deduplicator)
+            if partitioned:
+                loader = PartitionedLoader(client[mongodb_dbname], collection_name, **loader_options)
+            else:
+                loader = EcobiciDataLoader(client[mongodb_dbname][collection_name], **loader_options)
+                loader.ensure_collection()
+                if drop_indexes:
+                    print(f"Dropped indexes before load: {loader.drop_indexes()}")
+            if build_rollups and (layout != 'flat' or partitioned):
+                print("Rollups are built from a single flat trips collection; skipped.")
+            elif build_rollups:
+                rollups = RollupManager(loader.collection)
+                rollups.ensure_indexes()
+            if catalog is not None:
+                print(f"Stations loaded: {load_stations(client[mongodb_dbname], catalog)}")
+        if mode == 'remote':
+            if loader is None:
+                raise ValueError("PIPELINE_MODE=remote requires MONGODB_URI and MONGODB_DBNAME.")
+            run_remote(extractor, transformer, queue_size, loader, tee_to_disk, rollups)
+            file_paths = []
+        else:
+            file_paths = extractor.list_csv_files()
         if file_paths:
-            df = extractor.read_files_in_parallel_pandas(file_paths[:5], max_workers=max_workers)
-            # df.to_csv("ecobici_data.csv", index=False)
-            # print(df.info())
-        transformed_df = transformer.transform_data(df)
-        print(transformed_df.info())
-        print(transformed_df.head(5)) #.transpose())
+            if mode == 'analytics':
+                run_analytics(extractor, transformer, file_paths, max_workers, executor, analytics_output)
+            elif incremental or partitioned:
+                if loader is None:
+                    raise ValueError("INCREMENTAL=1 and PARTITION_BY_MONTH=1 require MONGODB_URI and MONGODB_DBNAME.")
+                manifest = FileManifest(manifest_path or extractor.folder / ".manifest.json") if incremental else None
+                run_incremental(extractor, transformer, file_paths, manifest, queue_size, loader, rollups)
+            elif mode == 'stream':
+                run_stream(extractor, transformer, file_paths, queue_size, max_workers, executor, loader)
+            else:
+                run_batch(extractor, transformer, file_paths, max_workers, executor, loader, batch_max_files)
+            if rollups is not None and not (incremental or partitioned):
+                print(f"Rollups: {rollups.refresh()}")
+        if loader is not None:
+            print(f"Indexes: {loader.create_indexes()}")
+        if validator is not None and validator.counts:
+            print(f"Data quality:\n{validator.report().to_string()}")
         end_time = time.time()
         print(f"{end_time - start_time:.2f} seconds elapsed.")
     except FileNotFoundError as e:
         print(e)
+    finally:
+        if client is not None:
+            client.close()
+        if metrics is not None:
+            if metrics_prom:
+                metrics.write_prometheus(metrics_prom)
+            metrics.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .extract.archive import archive_member, member_info, open_source
+
+
+def file_sha256(file_path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open_source(file_path) as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_stat(file_path: Path) -> Tuple[int, float]:
+    """Size and modification time of a CSV; archive members report their uncompressed size and stored timestamp."""
+    if archive_member(file_path) is None:
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime
+    info = member_info(file_path)
+    return info.file_size, time.mktime(info.date_time + (0, 0, -1))
+
+
+@dataclass
+class ManifestEntry:
+    """Fingerprint of a processed file.
+
+    Attributes:
+        size (int): File size in bytes.
+        mtime (float): Modification time as a POSIX timestamp.
+        sha256 (str): Content hash.
+        processed_at (str): ISO timestamp of the last successful load.
+    """
+    size: int
+    mtime: float
+    sha256: str
+    processed_at: str = ""
+
+
+class FileManifest:
+    """Local JSON manifest of the files that have already been loaded.
+
+    A file is considered unchanged when its size and mtime match the stored
+    entry. When they differ the content hash decides, so touching a file
+    without modifying it only refreshes its entry instead of reprocessing it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, ManifestEntry] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = {key: ManifestEntry(**value) for key, value in json.load(f).items()}
+
+    @staticmethod
+    def key(file_path: Path) -> str:
+        return str(Path(file_path).resolve())
+
+    def is_unchanged(self, file_path: Path) -> bool:
+        entry = self.entries.get(self.key(file_path))
+        if entry is None:
+            return False
+        size, mtime = file_stat(file_path)
+        if size == entry.size and mtime == entry.mtime:
+            return True
+        if size == entry.size and file_sha256(file_path) == entry.sha256:
+            entry.mtime = mtime
+            self.save()
+            return True
+        return False
+
+    def pending(self, file_paths: Iterable[Path]) -> List[Path]:
+        """Returns the files that are new or changed since they were last recorded."""
+        return [file_path for file_path in file_paths if not self.is_unchanged(file_path)]
+
+    def record(self, file_path: Path, sha256: Optional[str] = None) -> None:
+        """Marks a file as processed with its current fingerprint and saves the manifest."""
+        size, mtime = file_stat(file_path)
+        self.entries[self.key(file_path)] = ManifestEntry(
+            size=size,
+            mtime=mtime,
+            sha256=sha256 or file_sha256(file_path),
+            processed_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        )
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({key: asdict(entry) for key, entry in self.entries.items()}, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,55 @@
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from .extract.extraction import EcobiciDataExtractor
+from .transform.transformation import EcobiciDataTransformer
+
+load_dotenv()
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def memory_report(source: str, file_paths: Optional[Iterable[Path]] = None) -> pd.DataFrame:
+    """Compares the in-memory size of each month read without and with the declared schema.
+
+    Args:
+        source (str): Base path that contains the ``ecobici_data`` folder.
+        file_paths (Iterable[Path], optional): Files to measure; defaults to every CSV.
+
+    Returns:
+        pd.DataFrame: One row per month with the untyped read, the typed read
+        (``CSV_DTYPES``) and the transformed records (``TRIP_SCHEMA``) in MB.
+    """
+    untyped = EcobiciDataExtractor(source, typed=False)
+    typed = EcobiciDataExtractor(source)
+    transformer = EcobiciDataTransformer()
+    rows = []
+    for file_path in sorted(file_paths or typed.list_csv_files()):
+        untyped_mb = memory_mb(untyped.read_file_pandas(file_path))
+        df = typed.read_file_pandas(file_path)
+        typed_mb = memory_mb(df)
+        transformed_mb = memory_mb(transformer.transform_data(df, copy=False))
+        rows.append({
+            "month": file_path.stem,
+            "rows": len(df),
+            "untyped_mb": round(untyped_mb, 2),
+            "typed_mb": round(typed_mb, 2),
+            "transformed_mb": round(transformed_mb, 2),
+            "saving_pct": round(100 * (1 - typed_mb / untyped_mb), 1) if untyped_mb else 0.0,
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    report = memory_report(os.getenv('BASE_PATH'))
+    print(report.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+Labels = Tuple[Tuple[str, str], ...]
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    """Thread-safe counters, gauges and timing spans for the ingestion stages.
+
+    Every ``span`` records its duration in a ``<name>_seconds`` summary (count
+    and sum, plus a ``<name>_max_seconds`` gauge) and counts failures in
+    ``<name>_errors_total``. Spans and explicit ``event`` calls are also
+    written as JSON lines when a path is given, and the current values can be
+    exported in the Prometheus text format to a file or over HTTP.
+
+    Args:
+        jsonl_path (str, optional): File that span and event records are appended to.
+        profile_stages (Iterable[str]): Span names to run under a profiler.
+        profiler (str): ``"cprofile"`` or ``"pyinstrument"``.
+        profile_dir (str, optional): Where profiles are written; defaults to ``profiles``.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, profile_stages: Iterable[str] = (), profiler: str = "cprofile", profile_dir: Optional[str] = None):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unsupported profiler: {profiler}. Use one of {PROFILERS}.")
+        if profiler == "pyinstrument" and pyinstrument is None:
+            raise ImportError("pyinstrument is required for PROFILER=pyinstrument.")
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.summaries: Dict[Tuple[str, Labels], list] = {}
+        self.profile_stages = set(profile_stages)
+        self.profiler = profiler
+        self.profile_dir = Path(profile_dir or "profiles")
+        self._lock = threading.Lock()
+        self._jsonl = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+        self._profiled = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Adds one duration to the ``<name>_seconds`` summary."""
+        key = (name, _labels(labels))
+        with self._lock:
+            summary = self.summaries.setdefault(key, [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += seconds
+            summary[2] = max(summary[2], seconds)
+
+    def event(self, name: str, **fields) -> None:
+        """Writes one JSON line, e.g. a finished span or a skipped file."""
+        if self._jsonl is None:
+            return
+        record = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "event": name, **fields}
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._jsonl.write(line + "\n")
+            self._jsonl.flush()
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[dict]:
+        """Times a block of work; yields a dict whose items are added to the JSON line (e.g. rows)."""
+        extra: dict = {}
+        error = None
+        start = time.perf_counter()
+        try:
+            with self.profile(name):
+                yield extra
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            self.inc(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(name, elapsed, **labels)
+            self.event(name, duration_s=round(elapsed, 6), error=error, **labels, **extra)
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Runs a block under the configured profiler if ``name`` is one of the profiled stages."""
+        if name not in self.profile_stages:
+            yield
+            return
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._profiled += 1
+            path = self.profile_dir / f"{name}-{os.getpid()}-{self._profiled}"
+        if self.profiler == "pyinstrument":
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                path.with_suffix(".html").write_text(profiler.output_html(), encoding="utf-8")
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                profiler.dump_stats(str(path.with_suffix(".prof")))
+
+    def timed(self, iterable: Iterable, name: str, **labels) -> Iterator:
+        """Yields the items of ``iterable``, timing how long producing each one took."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            except BaseException:
+                self.inc(f"{name}_errors_total", **labels)
+                raise
+            self.observe(name, time.perf_counter() - start, **labels)
+            yield item
+
+    def to_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            summaries = {key: list(value) for key, value in self.summaries.items()}
+        lines = []
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            for name in sorted({name for name, _ in values}):
+                metric = _metric_name(name)
+                lines.append(f"# TYPE {metric} {kind}")
+                lines.extend(f"{metric}{_format_labels(labels)} {value}" for (n, labels), value in values.items() if n == name)
+        for name in sorted({name for name, _ in summaries}):
+            metric = _metric_name(f"{name}_seconds")
+            lines.append(f"# TYPE {metric} summary")
+            for (n, labels), (count, total, _) in summaries.items():
+                if n == name:
+                    lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+            metric = _metric_name(f"{name}_max_seconds")
+            lines.append(f"# TYPE {metric} gauge")
+            lines.extend(f"{metric}{_format_labels(labels)} {peak}" for (n, labels), (_, _, peak) in summaries.items() if n == name)
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Writes the metrics to a file, e.g. for node_exporter's textfile collector."""
+        path = Path(path)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(self.to_prometheus(), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Serves ``/metrics`` over HTTP from a daemon thread until ``close`` is called."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+class NullMetrics(Metrics):
+    """Metrics that record nothing; the default when instrumentation is off."""
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        pass
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        pass
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        pass
+
+    def event(self, name: str, **fields) -> None:
+        pass
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[dict]:
+        yield {}
+
+    def timed(self, iterable: Iterable, name: str, **labels) -> Iterator:
+        return iter(iterable)
+
+
+NULL_METRICS = NullMetrics()
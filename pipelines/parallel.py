@@ -0,0 +1,159 @@
+import io
+import json
+import logging
+import os
+import pickle
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+from functools import partial
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import pandas as pd
+
+from .extract.archive import archive_member
+from .extract.cache import ColumnarCache
+from .extract.extraction import EcobiciDataExtractor
+from .metrics import NULL_METRICS, Metrics
+from .transform.transformation import EcobiciDataTransformer
+from .transform.enrichment import TripEnricher
+from .transform.validation import TripValidator
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+EXECUTORS = ("thread", "process")
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Stores repeated strings (dates, HH:MM times, gender) as categoricals."""
+    for col in df.columns:
+        if df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def serialize_frame(df: pd.DataFrame) -> bytes:
+    """Encodes a DataFrame as an Arrow IPC stream, or a pickle if pyarrow is missing."""
+    if pa is None:
+        return pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def deserialize_frame(payload: bytes) -> pd.DataFrame:
+    if pa is None:
+        return pickle.loads(payload)
+    with pa.ipc.open_stream(payload) as reader:
+        return reader.read_all().to_pandas()
+
+
+def extract_transform_file(source: str, subfolder: str, file_path: Path, serialize: bool = False, cache: Optional[ColumnarCache] = None, metrics: Optional[Metrics] = None, validator: Optional[TripValidator] = None, enricher: Optional[TripEnricher] = None) -> Union[pd.DataFrame, Tuple[bytes, Optional[Dict[str, Dict[str, int]]]]]:
+    """Reads, standardizes and transforms a single file end-to-end.
+
+    Module-level so it can be pickled into process pool workers, which build
+    their own extractor and transformer. With a cache, the transformed month
+    is reused while its CSV is unchanged. ``metrics`` can only be shared
+    with thread workers; process workers get a copy of ``validator``, so its
+    quarantine sink must be picklable. Enrichment is cheap and runs after
+    the cache, so cached months pick up catalog changes.
+
+    The quality counts of the file are added to ``validator``; with
+    ``serialize`` they are also returned next to the Arrow buffer, since a
+    process worker's copy of the validator is discarded.
+    """
+    if archive_member(file_path) is not None:
+        cache = None
+    # Validated months are cached apart, since failing rows have been removed from them,
+    # and under the fingerprint of the rules, so a new catalog or threshold revalidates them.
+    stage = "transformed" if validator is None else "validated"
+    tag = validator.fingerprint() if validator is not None else ""
+    file_validator = validator.spawn() if validator is not None else None
+    if cache is not None and cache.is_fresh(file_path, stage, tag):
+        df = cache.read(file_path, stage)
+        if file_validator is not None:
+            file_validator.merge(json.loads(cache.read_metadata(file_path, stage).get("validation_counts", "{}")))
+    else:
+        extractor = EcobiciDataExtractor(source, subfolder, cache=cache, metrics=metrics)
+        transformer = EcobiciDataTransformer(metrics, file_validator)
+        df = compact_frame(transformer.transform_data(extractor.read_file_pandas(file_path), copy=False))
+        if cache is not None:
+            extra = {"validation_counts": json.dumps(file_validator.counts)} if file_validator is not None else None
+            cache.write(file_path, df, stage, tag, extra)
+    counts = None
+    if file_validator is not None:
+        counts = file_validator.counts
+        validator.merge(counts)
+    if enricher is not None:
+        df = enricher.enrich(df)
+    return (serialize_frame(df), counts) if serialize else df
+
+
+def worker_error(metrics: Optional[Metrics], file_path: Path, error: Exception) -> None:
+    """Logs and counts a file whose worker failed, so files dropped by the pool show up in the metrics."""
+    metrics = metrics or NULL_METRICS
+    logging.error(f"Error al procesar {file_path.name}: {error}", exc_info=error)
+    metrics.inc("worker_errors_total", month=file_path.stem)
+    metrics.event("worker_error", file=str(file_path), error=f"{type(error).__name__}: {error}")
+
+
+def make_executor(kind: str, max_workers: int) -> Executor:
+    if kind not in EXECUTORS:
+        raise ValueError(f"Unsupported executor: {kind}. Use one of {EXECUTORS}.")
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+
+def iter_transformed_files(extractor: EcobiciDataExtractor, file_paths: Iterable[Path], max_workers: Optional[int] = 4, executor: str = "process", validator: Optional[TripValidator] = None, enricher: Optional[TripEnricher] = None) -> Iterator[pd.DataFrame]:
+    """Extracts and transforms files in a worker pool, yielding one DataFrame per file.
+
+    Results are yielded in input order and at most ``2 * max_workers`` files
+    are in flight, so finished files do not pile up in memory. Process workers
+    ship their results back as Arrow buffers instead of pickled object columns,
+    with their quality counts, which are merged into ``validator``.
+
+    Args:
+        extractor (EcobiciDataExtractor): Provides the source and subfolder for the workers.
+        file_paths (Iterable[Path]): Files to process.
+        max_workers (int, optional): Pool size; ``0``/``None`` uses every core.
+        executor (str): ``"thread"`` or ``"process"``.
+        validator (TripValidator, optional): Data-quality rules applied after the transform.
+        enricher (TripEnricher, optional): Adds duration and distance columns.
+    """
+    serialize = executor == "process"
+    max_workers = max_workers or os.cpu_count()
+    # Process workers record into their own copies, so only thread workers share the extractor's metrics.
+    metrics = None if serialize else extractor.metrics
+    work = partial(extract_transform_file, extractor.source, extractor.subfolder, serialize=serialize, cache=extractor.cache, metrics=metrics, validator=validator, enricher=enricher)
+    with make_executor(executor, max_workers) as pool:
+        limit = 2 * max_workers
+        pending: Deque[tuple] = deque()
+        for file_path in file_paths:
+            pending.append((file_path, pool.submit(work, file_path)))
+            if len(pending) >= limit:
+                yield from _result(*pending.popleft(), serialize, validator, extractor.metrics)
+        while pending:
+            yield from _result(*pending.popleft(), serialize, validator, extractor.metrics)
+
+
+def _result(file_path: Path, future: Future, serialize: bool, validator: Optional[TripValidator] = None, metrics: Optional[Metrics] = None) -> Iterator[pd.DataFrame]:
+    try:
+        result = future.result()
+    except Exception as e:
+        worker_error(metrics, file_path, e)
+        return
+    if serialize:
+        payload, counts = result
+        if counts and validator is not None:
+            validator.merge(counts)
+        df = deserialize_frame(payload)
+    else:
+        df = result
+    if not df.empty:
+        yield df
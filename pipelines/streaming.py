@@ -0,0 +1,71 @@
+import queue
+import threading
+from typing import Iterable, Iterator, Optional, TypeVar
+
+from .metrics import NULL_METRICS, Metrics
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def bounded(iterable: Iterable[T], maxsize: int = 2, metrics: Optional[Metrics] = None, name: str = "queue") -> Iterator[T]:
+    """Runs ``iterable`` in a background thread behind a bounded queue.
+
+    The producer blocks once ``maxsize`` items are waiting, so a fast stage
+    can only run ``maxsize`` items ahead of the stage consuming it. Errors
+    raised by the producer are re-raised in the consumer.
+
+    Args:
+        iterable (Iterable[T]): Upstream stage, e.g. a chunk generator.
+        maxsize (int): Maximum number of items buffered between the stages.
+        metrics (Metrics, optional): Receives the queue depth as the
+            ``queue_depth`` gauge, labelled with ``name``.
+        name (str): Label of this queue in the metrics.
+
+    Yields:
+        T: Items of ``iterable`` in order.
+    """
+    items: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    metrics = metrics or NULL_METRICS
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                metrics.set_gauge("queue_depth", items.qsize(), queue=name)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+            return
+        put(_DONE)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            metrics.set_gauge("queue_depth", items.qsize(), queue=name)
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
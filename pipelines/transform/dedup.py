@@ -0,0 +1,201 @@
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from config.settings import TRIP_KEY_COLUMNS
+from ..metrics import NULL_METRICS, Metrics
+
+EMPTY_KEYS = np.empty(0, dtype=np.int64)
+
+
+def trip_keys(df: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of ``TRIP_KEY_COLUMNS`` per row, as signed integers so they fit a BSON int64.
+
+    The hash depends on the column dtypes, which ``TRIP_SCHEMA`` fixes for
+    transformed chunks, so the same trip gets the same key in every run.
+    """
+    return pd.util.hash_pandas_object(df[list(TRIP_KEY_COLUMNS)], index=False).to_numpy().view(np.int64)
+
+
+def isin_sorted(keys: np.ndarray, sorted_keys: np.ndarray) -> np.ndarray:
+    """Membership of ``keys`` in a sorted array, by binary search."""
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool)
+    positions = np.searchsorted(sorted_keys, keys).clip(max=len(sorted_keys) - 1)
+    return sorted_keys[positions] == keys
+
+
+class TripKeySet:
+    """Sorted trip keys per source month, stored as one ``<YYYY-MM>.npy`` file per month.
+
+    Membership is checked against a single merged array, so a lookup is one
+    binary search however many months are loaded (8 bytes per trip in memory).
+    Months are saved separately so a run only rewrites the months it touched.
+
+    Args:
+        path (str, optional): Directory of the key files; keys are kept in memory only without one.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self.months: Dict[str, np.ndarray] = {}
+        self._dirty: Set[str] = set()
+        self._merged: Optional[np.ndarray] = None
+        if self.path is not None and self.path.exists():
+            for file_path in sorted(self.path.glob("*.npy")):
+                self.months[file_path.stem] = np.load(file_path)
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self.months.values())
+
+    def merged(self) -> np.ndarray:
+        if self._merged is None:
+            self._merged = np.sort(np.concatenate([EMPTY_KEYS, *self.months.values()]))
+        return self._merged
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        return isin_sorted(keys, self.merged())
+
+    def add(self, month: str, keys: np.ndarray) -> None:
+        """Adds sorted, unique keys to a month."""
+        if not len(keys):
+            return
+        self.months[month] = np.union1d(self.months.get(month, EMPTY_KEYS), keys)
+        if self._merged is not None:
+            # Two sorted runs: the stable sort (timsort) merges them in linear time.
+            self._merged = np.sort(np.concatenate([self._merged, keys]), kind="stable")
+        self._dirty.add(month)
+
+    def discard(self, month: str) -> None:
+        """Forgets the keys of a month, e.g. before the month is replaced in MongoDB."""
+        if self.months.pop(month, None) is not None:
+            self._merged = None
+            self._dirty.add(month)
+
+    def save(self) -> None:
+        """Writes the months changed since the last save."""
+        if self.path is None:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        for month in self._dirty:
+            file_path = self.path / f"{month}.npy"
+            if month not in self.months:
+                file_path.unlink(missing_ok=True)
+                continue
+            tmp_path = file_path.with_suffix(".npy.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, self.months[month])
+            os.replace(tmp_path, file_path)
+        self._dirty.clear()
+
+
+class TripDeduplicator:
+    """Drops trips that were already seen, in this chunk, this run or a previous run.
+
+    Each transformed chunk gets a ``trip_key`` column (``trip_keys``); rows
+    whose key is known are dropped before they reach the loader, so a reload
+    never needs a lookup per document. Rows with a missing key column cannot
+    be identified and are always kept, with a null ``trip_key``.
+
+    Keys are attributed to the month of the file they were first seen in.
+    Call ``reset_month`` before a month is replaced in MongoDB so its own
+    trips are not dropped, and ``save`` once the load has finished.
+
+    Keys seen in this run are only kept in memory until the loader
+    ``confirm``s the batch that carried them, and only confirmed keys are
+    saved: a trip whose batch failed is retried by the next run instead of
+    being dropped as already loaded.
+    """
+
+    def __init__(self, keys: Optional[TripKeySet] = None, metrics: Optional[Metrics] = None):
+        self.keys = keys if keys is not None else TripKeySet()
+        self.metrics = metrics or NULL_METRICS
+        self.month: Optional[str] = None
+        self.pending = EMPTY_KEYS
+        self.seen = TripKeySet()
+        self.confirmed: Dict[str, List[np.ndarray]] = {}
+        self.dropped = 0
+
+    def _switch(self, month: str) -> None:
+        if month != self.month:
+            self.flush()
+            self.month = month
+
+    def flush(self) -> None:
+        """Moves the keys of the current month into the keys seen this run."""
+        if self.month is not None:
+            self.seen.add(self.month, self.pending)
+        self.month, self.pending = None, EMPTY_KEYS
+
+    def reset_month(self, month: str) -> None:
+        self.flush()
+        self.keys.discard(month)
+        self.seen.discard(month)
+        self.confirmed.pop(month, None)
+
+    def _dedupe_month(self, df: pd.DataFrame, month: str) -> pd.DataFrame:
+        self._switch(month)
+        keys = trip_keys(df)
+        valid = df[list(TRIP_KEY_COLUMNS)].notna().all(axis=1).to_numpy()
+        keep = ~pd.Series(keys).duplicated().to_numpy()
+        keep &= ~self.keys.contains(keys) & ~self.seen.contains(keys) & ~isin_sorted(keys, self.pending)
+        keep |= ~valid
+        self.pending = np.union1d(self.pending, keys[keep & valid])
+        out = df[keep] if not keep.all() else df
+        out = out.assign(trip_key=pd.array(keys[keep], dtype="Int64"))
+        if not valid.all():
+            out.loc[~valid[keep], "trip_key"] = pd.NA
+        dropped = len(df) - len(out)
+        if dropped:
+            self.dropped += dropped
+            self.metrics.inc("dedup_duplicates_total", dropped, month=month)
+        return out
+
+    def dedupe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Returns the rows of a transformed chunk whose trips have not been seen, with their ``trip_key``."""
+        if df.empty:
+            return df.assign(trip_key=pd.array([], dtype="Int64"))
+        if "source_month" not in df:
+            return self._dedupe_month(df, "")
+        months = df["source_month"].astype(str)
+        if (months.iloc[0] == months).all():
+            return self._dedupe_month(df, months.iloc[0])
+        # Batch mode concatenates several files; each month is checked in turn.
+        return pd.concat([self._dedupe_month(group, month) for month, group in df.groupby(months, sort=False)])
+
+    def dedupe_chunks(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        for chunk in chunks:
+            deduped = self.dedupe(chunk)
+            if len(deduped):
+                yield deduped
+
+    def confirm(self, batch: pd.DataFrame) -> None:
+        """Marks the trips of a deduplicated batch as stored in MongoDB, so ``save`` keeps their keys."""
+        keys = batch["trip_key"]
+        months = batch["source_month"].astype(str) if "source_month" in batch else pd.Series("", index=batch.index)
+        groups = [(months.iloc[0], keys)] if len(months) and (months.iloc[0] == months).all() else keys.groupby(months, sort=False)
+        for month, group in groups:
+            self.confirmed.setdefault(month, []).append(group.dropna().to_numpy(dtype=np.int64))
+
+    def save(self) -> None:
+        """Adds the confirmed keys to the key set and writes the months that changed."""
+        self.flush()
+        for month, parts in self.confirmed.items():
+            self.keys.add(month, np.unique(np.concatenate(parts)))
+        self.confirmed.clear()
+        self.keys.save()
+
+    def rollback(self) -> None:
+        """Forgets everything not saved yet and rereads the saved keys, e.g. after an abandoned load.
+
+        An in-memory key set has nothing to reread, so months discarded by
+        ``reset_month`` stay discarded.
+        """
+        self.month, self.pending = None, EMPTY_KEYS
+        self.seen = TripKeySet()
+        self.confirmed.clear()
+        if self.keys.path is not None:
+            self.keys = TripKeySet(self.keys.path)
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..metrics import NULL_METRICS, Metrics
+
+EARTH_RADIUS_M = 6_371_008.8
+
+# Accepted spellings of the catalog columns in a CSV export.
+CATALOG_ALIASES = {
+    "station_id": ("station_id", "id", "short_name"),
+    "lat": ("lat", "latitude", "latitud"),
+    "lon": ("lon", "lng", "longitude", "longitud"),
+    "name": ("name", "nombre"),
+}
+
+
+def haversine(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Great-circle distance in meters between points given in radians."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+class StationCatalog:
+    """Station coordinates held in arrays indexed by station id.
+
+    ``position[id]`` is the row of a station in ``ids``/``lat``/``lon``
+    (``-1`` for unknown ids), so per-trip lookups are array indexing instead
+    of joins.
+
+    Args:
+        stations (pd.DataFrame): One row per station with ``station_id``, ``lat``, ``lon`` and optionally ``name``.
+    """
+
+    def __init__(self, stations: pd.DataFrame):
+        stations = stations.dropna(subset=["station_id", "lat", "lon"]).drop_duplicates("station_id")
+        if stations.empty:
+            raise ValueError("The station catalog has no stations with coordinates.")
+        self.ids = stations["station_id"].to_numpy(dtype=np.int64)
+        if self.ids.min() < 0:
+            raise ValueError("Station ids must be non-negative integers.")
+        self.lat = stations["lat"].to_numpy(dtype=np.float64)
+        self.lon = stations["lon"].to_numpy(dtype=np.float64)
+        self.names = [name if pd.notna(name) else None for name in stations["name"]] if "name" in stations else [None] * len(self.ids)
+        self.position = np.full(int(self.ids.max()) + 1, -1, dtype=np.int32)
+        self.position[self.ids] = np.arange(len(self.ids), dtype=np.int32)
+        self.lat_rad = np.radians(self.lat)
+        self.lon_rad = np.radians(self.lon)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def read(cls, path: str) -> "StationCatalog":
+        """Loads a catalog from a CSV export or a GBFS ``station_information.json``.
+
+        Raises:
+            ValueError: If the file has no id, latitude or longitude column.
+        """
+        path = Path(path)
+        if path.suffix == ".json":
+            with open(path, encoding="utf-8") as f:
+                stations = pd.DataFrame(json.load(f)["data"]["stations"])
+            # GBFS station_id is an opaque string; ECOBICI's numeric station number is the short_name.
+            id_column = "short_name" if "short_name" in stations else "station_id"
+            stations = stations.rename(columns={id_column: "station_id"})
+        else:
+            raw = pd.read_csv(path)
+            lower = {col.lower(): col for col in raw.columns}
+            columns = {}
+            for canonical, aliases in CATALOG_ALIASES.items():
+                match = next((lower[alias] for alias in aliases if alias in lower), None)
+                if match is not None:
+                    columns[match] = canonical
+            stations = raw[list(columns)].rename(columns=columns)
+        missing = [col for col in ("station_id", "lat", "lon") if col not in stations]
+        if missing:
+            raise ValueError(f"{path.name} has no {', '.join(missing)} column for the station catalog.")
+        stations["station_id"] = pd.to_numeric(stations["station_id"], errors="coerce")
+        return cls(stations[[col for col in CATALOG_ALIASES if col in stations]])
+
+    def positions(self, station_ids: pd.Series) -> np.ndarray:
+        """Catalog row of each station id, ``-1`` when missing or unknown."""
+        ids = station_ids.to_numpy(dtype=np.int64, na_value=-1)
+        known = (ids >= 0) & (ids < len(self.position))
+        return np.where(known, self.position[np.where(known, ids, 0)], -1)
+
+    def fingerprint(self) -> str:
+        """Hash of the ids and coordinates, used to name cached distance matrices."""
+        digest = hashlib.sha256()
+        for values in (self.ids, self.lat, self.lon):
+            digest.update(np.ascontiguousarray(values).tobytes())
+        return digest.hexdigest()[:16]
+
+    def to_documents(self) -> List[dict]:
+        """One document per station with a GeoJSON point, for a ``2dsphere`` index."""
+        return [
+            {"_id": int(station_id), "name": name, "location": {"type": "Point", "coordinates": [float(lon), float(lat)]}}
+            for station_id, name, lat, lon in zip(self.ids, self.names, self.lat, self.lon)
+        ]
+
+
+def distance_matrix(catalog: StationCatalog, cache_dir: Optional[str] = None) -> np.ndarray:
+    """Distances in meters between every pair of catalog stations, as float32.
+
+    About 2 MB for the ~700 ECOBICI stations. With ``cache_dir`` the matrix
+    is saved as ``distances-<fingerprint>.npy`` and reused while the catalog
+    is unchanged.
+    """
+    path = Path(cache_dir) / f"distances-{catalog.fingerprint()}.npy" if cache_dir else None
+    if path is not None and path.exists():
+        return np.load(path)
+    matrix = haversine(
+        catalog.lat_rad[:, None], catalog.lon_rad[:, None], catalog.lat_rad[None, :], catalog.lon_rad[None, :]
+    ).astype(np.float32)
+    if path is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".npy.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp_path, path)
+    return matrix
+
+
+class TripEnricher:
+    """Adds derived columns to transformed trips with vectorized lookups.
+
+    * ``duration_s`` (Int32): seconds between start and end timestamps.
+    * ``distance_m`` (float32): great-circle distance between the start and
+      end stations, NaN when either station is not in the catalog.
+    * ``start_lat``/``start_lon``/``end_lat``/``end_lon`` (float64), only
+      with ``coordinates=True``.
+
+    With a ``matrix`` from ``distance_matrix`` the distance is one indexed
+    read per trip instead of the haversine formula.
+    """
+
+    def __init__(self, catalog: StationCatalog, matrix: Optional[np.ndarray] = None, coordinates: bool = False, metrics: Optional[Metrics] = None):
+        if matrix is not None and matrix.shape != (len(catalog), len(catalog)):
+            raise ValueError("The distance matrix does not match the catalog.")
+        self.catalog = catalog
+        self.matrix = matrix
+        self.coordinates = coordinates
+        self.metrics = metrics or NULL_METRICS
+
+    def __getstate__(self):
+        # Process workers get the arrays; the parent's metrics stay behind.
+        state = self.__dict__.copy()
+        del state["metrics"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.metrics = NULL_METRICS
+
+    @staticmethod
+    def durations(df: pd.DataFrame) -> pd.array:
+        start = df["start_timestamp"].to_numpy(dtype="datetime64[ns]")
+        end = df["end_timestamp"].to_numpy(dtype="datetime64[ns]")
+        seconds = (end.view(np.int64) - start.view(np.int64)) // 1_000_000_000
+        missing = np.isnat(start) | np.isnat(end)
+        return pd.arrays.IntegerArray(np.where(missing, 0, seconds).astype(np.int32), missing)
+
+    def distances(self, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """Distance in meters between catalog positions (``-1`` gives NaN)."""
+        known = (start >= 0) & (end >= 0)
+        s, e = np.where(known, start, 0), np.where(known, end, 0)
+        if self.matrix is not None:
+            distance = self.matrix[s, e]
+        else:
+            catalog = self.catalog
+            distance = haversine(catalog.lat_rad[s], catalog.lon_rad[s], catalog.lat_rad[e], catalog.lon_rad[e]).astype(np.float32)
+        return np.where(known, distance, np.float32(np.nan))
+
+    def enrich(self, df: pd.DataFrame) -> pd.DataFrame:
+        start = self.catalog.positions(df["start_station_id"])
+        end = self.catalog.positions(df["end_station_id"])
+        columns = {"duration_s": self.durations(df), "distance_m": self.distances(start, end)}
+        if self.coordinates:
+            for prefix, positions in (("start", start), ("end", end)):
+                known = positions >= 0
+                index = np.where(known, positions, 0)
+                columns[f"{prefix}_lat"] = np.where(known, self.catalog.lat[index], np.nan)
+                columns[f"{prefix}_lon"] = np.where(known, self.catalog.lon[index], np.nan)
+        unknown = int(((start < 0) | (end < 0)).sum())
+        if unknown:
+            self.metrics.inc("enrich_unknown_stations_total", unknown)
+        return df.assign(**columns)
@@ -1,27 +1,169 @@
 import os
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from config.settings import TRIP_SCHEMA
+from ..metrics import NULL_METRICS, Metrics
+from .enrichment import TripEnricher
+from .validation import TripValidator
 
 
 load_dotenv()
 
 import re
 
+# Formats seen in the historic files, in the order they are tried. Day-first comes
+# before month-first, so a month of dd/mm/YYYY dates is never read as mm/dd.
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d/%m/%y", "%Y/%m/%d", "%d-%m-%Y", "%m/%d/%Y")
+
+TIME_PATTERN = r'(\d{1,2}):(\d{2})(?::(\d{2}))?'
+
+# A day has 86,400 HH:MM:SS values; anything past this bound is malformed input and the cache starts over.
+TIME_CACHE_SIZE = 100_000
+
+
 class EcobiciDataTransformer:
 
-    def __init__(self):
-        pass
+    def __init__(self, metrics: Optional[Metrics] = None, validator: Optional[TripValidator] = None, enricher: Optional[TripEnricher] = None):
+        self.metrics = metrics or NULL_METRICS
+        # Data-quality rules run after the schema is applied; failing rows leave the chunk.
+        self.validator = validator
+        # Duration and distance columns are added to the rows that passed validation.
+        self.enricher = enricher
+        # Detected date format per (source_month, column), so each file is sniffed once.
+        self.date_formats: Dict[Tuple[Any, str], Optional[str]] = {}
+        self.time_cache = pd.Series(dtype=np.float64, index=pd.Index([], dtype=object))
+
+    @staticmethod
+    def factorize(series: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+        """Splits a column into integer codes and its unique values (code -1 is missing).
+
+        Dates, times and genders repeat heavily, so parsing the uniques and
+        taking the results by code replaces a per-row parse with a per-value one.
+        """
+        codes, uniques = pd.factorize(series)
+        return codes, pd.Index(uniques)
+
+    @staticmethod
+    def detect_date_format(values: pd.Index, sample_size: int = 500) -> Optional[str]:
+        sample = values[:sample_size].astype(str)
+        best_format, best_score = None, 0.0
+        for fmt in DATE_FORMATS:
+            score = pd.to_datetime(sample, format=fmt, errors='coerce').notna().mean()
+            if score > best_score:
+                best_format, best_score = fmt, score
+                if score == 1.0:
+                    break
+        return best_format
+
+    def parse_dates(self, series: pd.Series, key: Tuple[Any, str] = (None, ""), months: Optional[pd.Series] = None) -> pd.Series:
+        """Parses a date column into datetime64 with an explicit, per-file format.
+
+        With ``months`` (the ``source_month`` column), a frame that spans
+        several files is parsed one month at a time, each with its own format.
+        """
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series.dt.normalize()
+        if months is not None:
+            month_codes, month_values = pd.factorize(months)
+            if len(month_values) > 1 or (month_codes == -1).any():
+                result = np.full(len(series), np.datetime64('NaT', 'ns'))
+                for code, month in [(-1, None), *enumerate(month_values)]:
+                    mask = month_codes == code
+                    if mask.any():
+                        result[mask] = self.parse_dates(series[mask], (month, key[1])).to_numpy()
+                return pd.Series(result, index=series.index)
+            key = (month_values[0] if len(month_values) else None, key[1])
+        codes, uniques = self.factorize(series)
+        if key not in self.date_formats:
+            self.date_formats[key] = self.detect_date_format(uniques)
+        fmt = self.date_formats[key]
+        if fmt is None:
+            parsed = pd.to_datetime(uniques.astype(str), errors='coerce', dayfirst=True)
+        else:
+            parsed = pd.to_datetime(uniques.astype(str), format=fmt, errors='coerce')
+        return pd.Series(self.take(parsed.values, codes, np.datetime64('NaT', 'ns')), index=series.index)
 
     @staticmethod
-    def extract_hour_minute_vectorized(series: pd.Series) -> pd.Series:
+    def seconds_of_day(values: pd.Series) -> pd.Series:
+        """Parses string times of day into seconds since midnight (NaN if unparseable)."""
+        # Plain H:MM[:SS] values are split numerically; anything else (e.g. full datetimes) goes through the regex.
+        parts = values.str.split(':', n=2, expand=True).reindex(columns=range(3))
+        hours, minutes, secs = (pd.to_numeric(parts[i], errors='coerce') for i in range(3))
+        seconds = hours * 3600 + minutes * 60 + secs.fillna(0)
+        fallback = seconds.isna() | (seconds >= 86400) | (seconds < 0)
+        if fallback.any():
+            matched = values[fallback].str.extract(TIME_PATTERN).astype(float)
+            seconds[fallback] = matched[0] * 3600 + matched[1] * 60 + matched[2].fillna(0)
+        return seconds
+
+    def parse_times(self, series: pd.Series) -> pd.Series:
+        """Parses HH:MM[:SS] values (or datetimes) into a timedelta64 time of day.
+
+        Parsed strings are kept in ``time_cache`` (string -> seconds): a day has
+        at most 86,400 distinct HH:MM:SS values, so after the first chunks of a
+        file almost every value is a hash lookup instead of a parse. The cache
+        is cleared if malformed values push it past ``TIME_CACHE_SIZE``.
+        """
         if pd.api.types.is_datetime64_any_dtype(series):
-            return series.dt.strftime('%H:%M')
-        return series.astype(str).str.extract(r'(\d{1,2}:\d{2})')[0]
+            return series - series.dt.normalize()
+        codes, uniques = self.factorize(series)
+        keys = pd.Index(uniques.astype(str), dtype=object)
+        positions = self.time_cache.index.get_indexer(keys)
+        new_keys = keys[positions == -1]
+        if len(new_keys):
+            parsed = self.seconds_of_day(pd.Series(new_keys, dtype=object).astype(str))
+            if len(self.time_cache) + len(new_keys) > TIME_CACHE_SIZE:
+                self.time_cache = self.time_cache.iloc[:0]
+            self.time_cache = pd.concat([self.time_cache, pd.Series(parsed.to_numpy(), index=new_keys, dtype=np.float64)])
+            positions = self.time_cache.index.get_indexer(keys)
+        seconds = self.time_cache.to_numpy()[positions]
+        parsed = pd.to_timedelta(seconds, unit='s').values
+        return pd.Series(self.take(parsed, codes, np.timedelta64('NaT', 'ns')), index=series.index)
+
+    @staticmethod
+    def take(values: np.ndarray, codes: np.ndarray, missing) -> np.ndarray:
+        if not len(values):
+            return np.full(len(codes), missing)
+        result = values.take(codes)
+        result[codes == -1] = missing
+        return result
+
+    @classmethod
+    def format_dates(cls, dates: pd.Series) -> pd.Series:
+        """Formats datetime64 dates as a categorical of YYYY-MM-DD strings, one strftime per distinct date."""
+        codes, uniques = cls.factorize(dates)
+        categories = [value.strftime('%Y-%m-%d') for value in uniques]
+        return pd.Series(pd.Categorical.from_codes(codes, categories), index=dates.index)
+
+    @staticmethod
+    def minutes_of_day(times: pd.Series) -> pd.Series:
+        return times.dt.total_seconds() // 60
+
+    @staticmethod
+    def apply_schema(dataset: pd.DataFrame) -> pd.DataFrame:
+        """Casts the known columns to ``TRIP_SCHEMA``.
 
-    def transform_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        dataset = df.copy()
+        Integer columns are range-checked first: non-integral or out-of-range
+        values (e.g. a 300 year old user for ``UInt8`` ages) become ``<NA>``
+        instead of wrapping around.
+        """
+        for col, dtype in TRIP_SCHEMA.items():
+            if col not in dataset.columns:
+                continue
+            if pd.api.types.is_integer_dtype(pd.api.types.pandas_dtype(dtype)):
+                info = np.iinfo(dtype.lower())
+                values = pd.to_numeric(dataset[col], errors='coerce')
+                valid = (values >= info.min) & (values <= info.max) & (values % 1 == 0)
+                dataset[col] = values.where(valid).astype(dtype)
+            else:
+                dataset[col] = dataset[col].astype(dtype)
+        return dataset
+
+    def transform_data(self, df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
+        dataset = df.copy() if copy else df
         dataset = (
             dataset
             .rename(columns={
@@ -36,24 +178,28 @@ class EcobiciDataTransformer:
                 'bici': 'bike_id',
             })
         )
-       
-        dataset['start_date'] = pd.to_datetime(dataset['start_date'], errors='coerce').dt.date
-        dataset['end_date'] = pd.to_datetime(dataset['end_date'], errors='coerce').dt.date
-
-        if 'start_time' in dataset.columns:
-            dataset['start_time'] = self.extract_hour_minute_vectorized(dataset['start_time'])
-        if 'end_time' in dataset.columns:
-            dataset['end_time'] = self.extract_hour_minute_vectorized(dataset['end_time'])
-
-        if 'age' in dataset.columns:
-            dataset['age'] = pd.to_numeric(dataset['age'], errors='coerce').astype('Int64')
-        if 'gender' in dataset.columns:
-            dataset['gender'] = dataset['gender'].astype('category')
-        for col in ['bike_id', 'start_station_id', 'end_station_id']:
-            if col in dataset.columns:
-                dataset[col] = pd.to_numeric(dataset[col], errors='coerce').astype('Int64')
-        
-        dataset['start_date'] = pd.to_datetime(dataset['start_date'], errors='coerce').dt.strftime('%Y-%m-%d')
-        dataset['end_date'] = pd.to_datetime(dataset['end_date'], errors='coerce').dt.strftime('%Y-%m-%d')
-        
-        return dataset
\ No newline at end of file
+
+        month = dataset['source_month'].iloc[0] if 'source_month' in dataset.columns and len(dataset) else None
+        with self.metrics.span('transform', month=month) as span:
+            present = self.validator.present(dataset) if self.validator is not None else None
+            for prefix in ('start', 'end'):
+                date_col, time_col = f'{prefix}_date', f'{prefix}_time'
+                dates = self.parse_dates(dataset[date_col], key=(month, date_col), months=dataset.get('source_month'))
+                if time_col in dataset.columns:
+                    times = self.parse_times(dataset[time_col])
+                    dataset[f'{prefix}_timestamp'] = dates + times
+                    dataset[time_col] = self.minutes_of_day(times)
+                dataset[date_col] = self.format_dates(dates)
+            dataset = self.apply_schema(dataset)
+            if self.validator is not None:
+                dataset = self.validator.validate(dataset, present, month)
+            if self.enricher is not None:
+                dataset = self.enricher.enrich(dataset)
+            span['rows'] = len(dataset)
+        self.metrics.inc('transform_rows_total', len(dataset), month=month)
+        return dataset
+
+    def transform_chunks(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Transforms chunks one at a time; chunks are owned by the stream, so no copy is made."""
+        for chunk in chunks:
+            yield self.transform_data(chunk, copy=False)
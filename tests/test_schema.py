@@ -0,0 +1,16 @@
+from pipelines.extract.extraction import EcobiciDataExtractor
+from pipelines.transform.transformation import EcobiciDataTransformer
+
+HEADER = "Genero_Usuario,Edad_Usuario,Bici,Ciclo_Estacion_Retiro,Fecha_Retiro,Hora_Retiro,Ciclo_Estacion_Arribo,Fecha_Arribo,Hora_Arribo\n"
+
+
+def test_bike_ids_above_float32_precision_round_trip(tmp_path):
+    folder = tmp_path / "ecobici_data" / "2024"
+    folder.mkdir(parents=True)
+    file_path = folder / "2024-01.csv"
+    bike_ids = [16_777_217, 123_456_789, 4_294_967_295]
+    file_path.write_text(HEADER + "".join(f"M,30,{bike},41,01/01/2024,08:00:00,42,01/01/2024,08:10:00\n" for bike in bike_ids))
+
+    df = EcobiciDataTransformer().transform_data(EcobiciDataExtractor(str(tmp_path)).read_file_pandas(file_path))
+
+    assert df["bike_id"].tolist() == bike_ids